@@ -1,937 +1,86 @@
-import io
 import json
-import re
-import time
-import zipfile
-import hashlib
-from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+import os
+import threading
+from typing import Any, Dict, Iterable, List
 
 import pandas as pd
 import streamlit as st
 
-# ---- Label Studio SDK: handle both "Client" and older "LabelStudio" naming ----
-ClientType = None
-try:
-    from label_studio_sdk import Client as _Client
-    ClientType = _Client
-except Exception:
-    try:
-        from label_studio_sdk import LabelStudio as _Client
-        ClientType = _Client
-    except Exception:
-        ClientType = None
-
-# =========================
-# SDK helpers
-# =========================
-@st.cache_data(show_spinner=False)
-def connect_ls(base_url: str, api_key: str):
-    if ClientType is None:
-        raise RuntimeError(
-            "label-studio-sdk not found or incompatible. Please `pip install label-studio-sdk`."
-        )
-    
-    # Clean up the base URL
-    base_url = base_url.rstrip('/')
-    
-    try:
-        # Try the official SDK method from documentation first
-        # Personal Access Tokens work automatically with SDK
-        try:
-            from label_studio_sdk.client import LabelStudio
-            client = LabelStudio(base_url=base_url, api_key=api_key)
-        except ImportError:
-            # Fallback to the dynamically imported ClientType
-            client = ClientType(base_url=base_url, api_key=api_key)
-        except TypeError:
-            # Try different parameter combinations for older SDK versions
-            try:
-                client = ClientType(url=base_url, api_key=api_key)
-            except TypeError:
-                # Some versions use 'token' instead of 'api_key'
-                client = ClientType(url=base_url, token=api_key)
-        
-        # Store connection details for fallback
-        client.url = base_url
-        client.api_key = api_key
-        return client
-        
-    except Exception as e:
-        raise RuntimeError(f"Failed to create Label Studio client: {e}")
-
-
-def get_access_token_from_pat(base_url: str, pat_token: str) -> str:
-    """Convert Personal Access Token to short-lived access token for HTTP API"""
-    import requests
-    
-    try:
-        url = f"{base_url.rstrip('/')}/api/token/refresh"
-        response = requests.post(
-            url,
-            headers={"Content-Type": "application/json"},
-            json={"refresh": pat_token},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("access", "")
-        else:
-            st.warning(f"Token refresh failed: {response.status_code} - {response.text}")
-            return ""
-            
-    except Exception as e:
-        st.warning(f"Failed to refresh PAT token: {e}")
-        return ""
-
-
-def test_connection(base_url: str, api_key: str) -> tuple[bool, str]:
-    """Test connection to Label Studio and return success status and message"""
-    try:
-        import requests
-        
-        # Clean up URL
-        base_url = base_url.rstrip('/')
-        
-        # Test basic connectivity first
-        try:
-            response = requests.get(f"{base_url}/health", timeout=10)
-            if response.status_code == 200:
-                st.write("✅ Health check passed")
-            else:
-                # Try without /health endpoint
-                response = requests.get(base_url, timeout=10)
-                if response.status_code == 200:
-                    st.write("✅ Base URL accessible")
-        except Exception as e:
-            return False, f"Cannot connect to {base_url}. Is Label Studio running on port 8082? Error: {e}"
-        
-        # Test authentication with debugging
-        endpoints = ["/api/projects/", "/api/projects"]
-        auth_formats = [
-            ("Bearer", f"Bearer {api_key}"),
-            ("Token", f"Token {api_key}")
-        ]
-        
-        for endpoint in endpoints:
-            st.write(f"Testing endpoint: {endpoint}")
-            for auth_name, auth_header in auth_formats:
-                try:
-                    url = f"{base_url}{endpoint}"
-                    headers = {
-                        "Authorization": auth_header,
-                        "Content-Type": "application/json"
-                    }
-                    params = {"page": 1, "page_size": 10}  # Small request
-                    
-                    st.write(f"  Trying {auth_name} authentication...")
-                    response = requests.get(url, headers=headers, params=params, timeout=10)
-                    
-                    st.write(f"    Response: {response.status_code}")
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        project_count = len(data) if isinstance(data, list) else len(data.get('results', []))
-                        return True, f"✅ Connected successfully! Found {project_count} projects using {auth_name} auth on {endpoint}"
-                    elif response.status_code == 401:
-                        st.write(f"    ❌ 401 Unauthorized with {auth_name}")
-                    elif response.status_code == 403:
-                        st.write(f"    ❌ 403 Forbidden")
-                    else:
-                        st.write(f"    ❌ {response.status_code}: {response.text[:100]}")
-                        
-                except Exception as e:
-                    st.write(f"    ❌ Error: {e}")
-                    continue
-        
-        return False, "❌ Authentication failed with all methods. Please check your API token."
-        
-    except Exception as e:
-        return False, f"❌ Connection test failed: {str(e)}"
-
-
-def _obj_to_dict(x: Any) -> Dict[str, Any]:
-    if x is None:
-        return {}
-    if isinstance(x, dict):
-        return x
-    for key in ("to_dict", "dict"):
-        if hasattr(x, key) and callable(getattr(x, key)):
-            try:
-                return getattr(x, key)()
-            except Exception:
-                pass
-    try:
-        return {k: getattr(x, k) for k in dir(x) if not k.startswith("_")}
-    except Exception:
-        return {"value": str(x)}
-
-
-def _safe_attr(x: Any, name: str, default=None):
-    try:
-        return getattr(x, name)
-    except Exception:
-        try:
-            d = _obj_to_dict(x)
-            return d.get(name, default)
-        except Exception:
-            return default
-
-
-def list_projects(client) -> List[Any]:
-    try:
-        # Priority 1: Try SDK methods (these handle PAT tokens automatically)
-        if hasattr(client, 'get_projects'):
-            try:
-                projects = client.get_projects()
-                st.success("✅ SDK get_projects() worked!")
-                return list(projects) if projects else []
-            except Exception as sdk_error:
-                st.warning(f"SDK get_projects failed: {sdk_error}, trying alternatives...")
-        
-        if hasattr(client, 'projects') and hasattr(client.projects, 'list'):
-            try:
-                projects = list(client.projects.list(page_size=100))
-                st.success("✅ SDK projects.list() worked!")
-                return projects
-            except Exception as sdk_error:
-                st.warning(f"SDK projects.list failed: {sdk_error}, trying alternatives...")
-        
-        if hasattr(client, 'list_projects'):
-            try:
-                projects = list(client.list_projects())
-                st.success("✅ SDK list_projects() worked!")
-                return projects
-            except Exception as sdk_error:
-                st.warning(f"SDK list_projects failed: {sdk_error}, trying HTTP API...")
-        
-        # Priority 2: Direct HTTP API calls with PAT token handling
-        st.info("Trying direct HTTP API calls with PAT token handling...")
-        import requests
-        
-        # Get the base URL and API key
-        base_url = getattr(client, 'url', getattr(client, 'base_url', ''))
-        api_key = getattr(client, 'api_key', '')
-        
-        if not base_url or not api_key:
-            raise RuntimeError("Missing base_url or api_key from client")
-        
-        # First, try to get an access token using PAT
-        access_token = get_access_token_from_pat(base_url, api_key)
-        
-        # Try different endpoints and auth formats
-        endpoints = ["/api/projects/", "/api/projects"]
-        auth_formats = []
-        
-        # If we got an access token from PAT, try Bearer with it
-        if access_token:
-            auth_formats.append(("Bearer (from PAT)", f"Bearer {access_token}"))
-        
-        # Also try the PAT directly with Bearer (some versions support this)
-        auth_formats.append(("Bearer (direct PAT)", f"Bearer {api_key}"))
-        
-        # Try legacy Token format as fallback
-        auth_formats.append(("Token (legacy)", f"Token {api_key}"))
-        
-        last_error = None
-        for endpoint in endpoints:
-            for auth_name, auth_header in auth_formats:
-                try:
-                    url = f"{base_url.rstrip('/')}{endpoint}"
-                    headers = {
-                        "Authorization": auth_header,
-                        "Content-Type": "application/json"
-                    }
-                    # Use simple pagination instead of large page_size
-                    params = {"page": 1, "page_size": 50}
-                    
-                    st.write(f"Trying {auth_name} auth on {endpoint}...")
-                    response = requests.get(url, headers=headers, params=params, timeout=30)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        st.success(f"✅ Success with {auth_name} auth!")
-                        
-                        # Handle both list and paginated responses
-                        if isinstance(data, list):
-                            return data
-                        elif isinstance(data, dict) and 'results' in data:
-                            # Get all pages if paginated
-                            all_projects = data['results']
-                            page = 2
-                            while data.get('next'):
-                                params['page'] = page
-                                response = requests.get(url, headers=headers, params=params, timeout=30)
-                                if response.status_code == 200:
-                                    data = response.json()
-                                    all_projects.extend(data.get('results', []))
-                                    page += 1
-                                else:
-                                    break
-                            return all_projects
-                        else:
-                            return data if isinstance(data, list) else [data]
-                            
-                    elif response.status_code == 401:
-                        last_error = f"401 Unauthorized with {auth_name} auth on {endpoint}"
-                        st.error(f"❌ {last_error}")
-                        continue
-                    elif response.status_code == 403:
-                        last_error = f"403 Forbidden - insufficient permissions"
-                        st.error(f"❌ {last_error}")
-                        continue
-                    elif response.status_code == 404:
-                        last_error = f"404 Not Found - endpoint {endpoint} does not exist"
-                        st.warning(f"⚠️ {last_error}")
-                        continue
-                    else:
-                        last_error = f"{response.status_code}: {response.text[:200]}"
-                        st.error(f"❌ {last_error}")
-                        continue
-                        
-                except requests.exceptions.ConnectionError:
-                    last_error = f"Connection failed to {base_url} - is Label Studio running on port 8082?"
-                    st.error(f"❌ {last_error}")
-                except requests.exceptions.Timeout:
-                    last_error = f"Request timeout to {base_url}"
-                    st.error(f"❌ {last_error}")
-                except Exception as e:
-                    last_error = f"Request error: {str(e)}"
-                    st.error(f"❌ {last_error}")
-        
-        # If we get here, all attempts failed
-        raise RuntimeError(f"All authentication attempts failed. Last error: {last_error}")
-            
-    except Exception as e:
-        if "401" in str(e) or "Unauthorized" in str(e):
-            raise RuntimeError(
-                f"Authentication failed (401 Unauthorized). Please check:\n"
-                f"1. Your API token is correct and not expired\n"
-                f"2. Generate a new token in Label Studio: Account & Settings → Access Token\n"
-                f"3. Make sure Label Studio is running and accessible\n"
-                f"4. For Personal Access Tokens, the SDK should handle token refresh automatically\n"
-                f"Original error: {e}"
-            )
-        else:
-            raise RuntimeError(f"Could not list projects: {e}")
-        
-        if not base_url or not api_key:
-            raise RuntimeError("Missing base_url or api_key from client")
-        
-        # Try different endpoints and auth formats
-        endpoints = ["/api/projects/", "/api/projects", "/api/dm/projects/"]
-        auth_formats = [
-            ("Bearer", f"Bearer {api_key}"),
-            ("Token", f"Token {api_key}"),
-        ]
-        
-        last_error = None
-        for endpoint in endpoints:
-            for auth_name, auth_header in auth_formats:
-                try:
-                    url = f"{base_url.rstrip('/')}{endpoint}"
-                    headers = {
-                        "Authorization": auth_header,
-                        "Content-Type": "application/json"
-                    }
-                    # Use simple pagination instead of large page_size
-                    params = {"page": 1, "page_size": 100}
-                    
-                    st.write(f"Trying {auth_name} auth on {endpoint}...")
-                    response = requests.get(url, headers=headers, params=params, timeout=30)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        st.success(f"✅ Success with {auth_name} auth!")
-                        
-                        # Handle both list and paginated responses
-                        if isinstance(data, list):
-                            return data
-                        elif isinstance(data, dict) and 'results' in data:
-                            # Get all pages if paginated
-                            all_projects = data['results']
-                            page = 2
-                            while data.get('next'):
-                                params['page'] = page
-                                response = requests.get(url, headers=headers, params=params, timeout=30)
-                                if response.status_code == 200:
-                                    data = response.json()
-                                    all_projects.extend(data.get('results', []))
-                                    page += 1
-                                else:
-                                    break
-                            return all_projects
-                        else:
-                            return data if isinstance(data, list) else [data]
-                            
-                    elif response.status_code == 401:
-                        last_error = f"401 Unauthorized with {auth_name} auth on {endpoint}"
-                        st.error(f"❌ {last_error}")
-                        continue
-                    elif response.status_code == 403:
-                        last_error = f"403 Forbidden - insufficient permissions"
-                        st.error(f"❌ {last_error}")
-                        continue
-                    elif response.status_code == 404:
-                        last_error = f"404 Not Found - endpoint {endpoint} does not exist"
-                        st.warning(f"⚠️ {last_error}")
-                        continue
-                    else:
-                        last_error = f"{response.status_code}: {response.text[:200]}"
-                        st.error(f"❌ {last_error}")
-                        continue
-                        
-                except requests.exceptions.ConnectionError:
-                    last_error = f"Connection failed to {base_url} - is Label Studio running on port 8082?"
-                    st.error(f"❌ {last_error}")
-                except requests.exceptions.Timeout:
-                    last_error = f"Request timeout to {base_url}"
-                    st.error(f"❌ {last_error}")
-                except Exception as e:
-                    last_error = f"Request error: {str(e)}"
-                    st.error(f"❌ {last_error}")
-        
-        # If we get here, all attempts failed
-        raise RuntimeError(f"All authentication attempts failed. Last error: {last_error}")
-            
-    except Exception as e:
-        if "401" in str(e) or "Unauthorized" in str(e):
-            raise RuntimeError(
-                f"Authentication failed (401 Unauthorized). Please check:\n"
-                f"1. Your API token is correct and not expired\n"
-                f"2. Generate a new token in Label Studio: Account & Settings → Access Token\n"
-                f"3. Make sure Label Studio is running and accessible\n"
-                f"Original error: {e}"
-            )
-        else:
-            raise RuntimeError(f"Could not list projects: {e}")
-
+from ls_api import (
+    DEFAULT_RETRY,
+    EXPORT_WORKERS,
+    HTTP_POOL_SIZE,
+    ClientView,
+    ImportBatchError,
+    Reporter,
+    RetryPolicy,
+    _safe_attr,
+    async_client,
+    build_export_snapshot,
+    build_export_stream,
+    concat_and_dedup,
+    connect_ls,
+    create_project,
+    export_projects_parallel,
+    get_project,
+    import_in_batches,
+    iter_export_snapshot,
+    iter_export_stream,
+    label_config_of,
+    list_projects,
+    near_dedup,
+    project_summaries,
+    projects_dataframe,
+    rate_governor,
+    set_reporter,
+    source_state,
+    stream_merge_import,
+    task_cache,
+    test_connection,
+)
+from ls_async import run as run_async
+from ls_journal import ImportJournal, fingerprint_config, fingerprint_tasks
+from ls_parallel import PARALLEL_MIN_TASKS, rewrite_keyed_lists
+from ls_phash import DEFAULT_DISTANCE
+from ls_rewrite import RULE_OPS, RewritePlan
 
-def get_project(client, pid: int):
-    try:
-        # Try modern SDK first
-        if hasattr(client, 'projects') and hasattr(client.projects, 'get'):
-            return client.projects.get(id=pid)
-        elif hasattr(client, 'get_project'):
-            return client.get_project(pid)
-        else:
-            # Fallback to direct API call
-            import requests
-            # Try Bearer token first (LS 1.20+), then Token (legacy)
-            for auth_type in ["Bearer", "Token"]:
-                response = requests.get(f"{client.url}/api/projects/{pid}/", headers={"Authorization": f"{auth_type} {client.api_key}"})
-                if response.status_code != 401:
-                    response.raise_for_status()
-                    return response.json()
-            # If both fail, raise the last error
-            response.raise_for_status()
-            return response.json()
-    except Exception:
-        # Fallback: search in projects list
-        projs = list_projects(client)
-        for p in projs:
-            if int(_safe_attr(p, "id")) == int(pid):
-                return p
-        raise RuntimeError(f"Project {pid} not found")
-
-
-def label_config_of(project) -> str:
-    return _safe_attr(project, "label_config", "")
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except Exception:  # older/newer Streamlit layouts
+    add_script_run_ctx = get_script_run_ctx = None
 
 
 # =========================
-# Exporters (stream + snapshot)
+# Streamlit bindings
 # =========================
 
-def tasks_iter(client, project_id: int, fields: str = "all", page_size: int = 1000):
-    try:
-        # Try modern SDK first
-        if hasattr(client, 'tasks') and hasattr(client.tasks, 'list'):
-            for t in client.tasks.list(project=project_id, fields=fields, page_size=page_size):
-                yield t
-        elif hasattr(client, 'get_project_tasks'):
-            tasks = client.get_project_tasks(project_id)
-            for t in tasks:
-                yield t
-        else:
-            # Fallback to direct API call
-            import requests
-            page = 1
-            # Try Bearer token first (LS 1.20+), then Token (legacy)
-            auth_header = None
-            for auth_type in ["Bearer", "Token"]:
-                test_response = requests.get(
-                    f"{client.url}/api/projects/{project_id}/tasks/",
-                    headers={"Authorization": f"{auth_type} {client.api_key}"},
-                    params={"page": 1, "page_size": 1}
-                )
-                if test_response.status_code != 401:
-                    auth_header = {"Authorization": f"{auth_type} {client.api_key}"}
-                    break
-            
-            if not auth_header:
-                raise RuntimeError("Authentication failed with both Bearer and Token formats")
-            
-            while True:
-                response = requests.get(
-                    f"{client.url}/api/projects/{project_id}/tasks/",
-                    headers=auth_header,
-                    params={"page": page, "page_size": page_size}
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                if isinstance(data, dict) and 'results' in data:
-                    tasks = data['results']
-                    if not tasks:
-                        break
-                    for t in tasks:
-                        yield t
-                    if not data.get('next'):
-                        break
-                    page += 1
-                elif isinstance(data, list):
-                    for t in data:
-                        yield t
-                    break
-                else:
-                    break
-    except Exception as e:
-        st.warning(f"Could not iterate tasks for project {project_id}: {e}")
-        return
-
-
-def build_export_stream(
-    client,
-    project_id: int,
-    include_annotations: bool = True,
-    include_predictions: bool = False,
-) -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
-    for t in tasks_iter(client, project_id, fields="all", page_size=1000):
-        item: Dict[str, Any] = {"data": dict(_safe_attr(t, "data", {}) or {})}
-        if include_annotations:
-            anns = []
-            for a in (_safe_attr(t, "annotations", []) or []):
-                anns.append({"result": _safe_attr(a, "result", [])})
-            if anns:
-                item["annotations"] = anns
-        if include_predictions:
-            preds = []
-            for p in (_safe_attr(t, "predictions", []) or []):
-                preds.append({"result": _safe_attr(p, "result", [])})
-            if preds:
-                item["predictions"] = preds
-        out.append(item)
-    return out
-
-
-def build_export_snapshot(client, project_id: int, poll_seconds: int = 2, timeout: int = 1800) -> List[Dict[str, Any]]:
-    """Create a server-side export snapshot, download ZIP, and extract tasks JSON.
-    Returns a list[task]. Assumes default LS export format.
-    """
-    # Create export
-    try:
-        # Try different SDK methods
-        if hasattr(client, 'projects') and hasattr(client.projects, 'exports'):
-            snap = client.projects.exports.create(id=project_id, title=f"snapshot-{project_id}")
-        elif hasattr(client, 'make_request'):
-            # Direct API call through SDK
-            snap = client.make_request('POST', f'/api/projects/{project_id}/exports/', json={'title': f"snapshot-{project_id}"})
-        else:
-            # Fallback to requests
-            import requests
-            # Try Bearer token first (LS 1.20+), then Token (legacy)
-            for auth_type in ["Bearer", "Token"]:
-                response = requests.post(
-                    f"{client.url}/api/projects/{project_id}/exports/",
-                    headers={"Authorization": f"{auth_type} {client.api_key}"},
-                    json={'title': f"snapshot-{project_id}"}
-                )
-                if response.status_code != 401:
-                    response.raise_for_status()
-                    snap = response.json()
-                    break
-            else:
-                response.raise_for_status()
-                snap = response.json()
-    except Exception as e:
-        # Fallback to stream export if snapshot fails
-        st.warning(f"Snapshot export failed for project {project_id}, falling back to stream export: {e}")
-        return build_export_stream(client, project_id, include_annotations=True, include_predictions=False)
-
-    snap_id = _safe_attr(snap, "id")
-    status = _safe_attr(snap, "status", "")
-
-    # Poll
-    start = time.time()
-    while status not in ("completed", "failed", "error"):
-        time.sleep(poll_seconds)
-        # refresh snapshot status
-        try:
-            if hasattr(client, 'projects') and hasattr(client.projects, 'exports'):
-                snap = client.projects.exports.get(id=project_id, export_id=snap_id)
-            else:
-                # Fallback API call
-                import requests
-                # Try Bearer token first (LS 1.20+), then Token (legacy)
-                for auth_type in ["Bearer", "Token"]:
-                    response = requests.get(
-                        f"{client.url}/api/projects/{project_id}/exports/{snap_id}/",
-                        headers={"Authorization": f"{auth_type} {client.api_key}"}
-                    )
-                    if response.status_code != 401:
-                        response.raise_for_status()
-                        snap = response.json()
-                        break
-                else:
-                    response.raise_for_status()
-                    snap = response.json()
-            status = _safe_attr(snap, "status", "")
-        except Exception:
-            # Some SDKs don't expose .get(); try listing and filtering
-            try:
-                if hasattr(client, 'projects') and hasattr(client.projects, 'exports'):
-                    exps = client.projects.exports.list(id=project_id)
-                else:
-                    import requests
-                    # Try Bearer token first (LS 1.20+), then Token (legacy)
-                    for auth_type in ["Bearer", "Token"]:
-                        response = requests.get(
-                            f"{client.url}/api/projects/{project_id}/exports/",
-                            headers={"Authorization": f"{auth_type} {client.api_key}"}
-                        )
-                        if response.status_code != 401:
-                            response.raise_for_status()
-                            exps = response.json()
-                            break
-                    else:
-                        response.raise_for_status()
-                        exps = response.json()
-                
-                for e in exps:
-                    if _safe_attr(e, "id") == snap_id:
-                        status = _safe_attr(e, "status", "")
-                        break
-            except Exception:
-                break
-                
-        if time.time() - start > timeout:
-            raise TimeoutError(f"Snapshot export timed out for project {project_id}")
+class StreamlitReporter(Reporter):
+    """Render API-layer messages in the current script run."""
 
-    if status != "completed":
-        raise RuntimeError(f"Snapshot export ended with status '{status}' for project {project_id}")
+    def write(self, message: str) -> None:
+        st.write(message)
 
-    # Download ZIP into memory
-    buf = io.BytesIO()
-    try:
-        if hasattr(client, 'projects') and hasattr(client.projects, 'exports'):
-            client.projects.exports.download(id=project_id, export_id=snap_id, path=buf)
-        else:
-            # Fallback download
-            import requests
-            # Try Bearer token first (LS 1.20+), then Token (legacy)
-            for auth_type in ["Bearer", "Token"]:
-                response = requests.get(
-                    f"{client.url}/api/projects/{project_id}/exports/{snap_id}/download/",
-                    headers={"Authorization": f"{auth_type} {client.api_key}"}
-                )
-                if response.status_code != 401:
-                    response.raise_for_status()
-                    buf.write(response.content)
-                    break
-            else:
-                response.raise_for_status()
-                buf.write(response.content)
-    except TypeError:
-        # Some SDKs require a file path; fall back to tmp file then read back
-        tmp = Path(f"snapshot_{project_id}_{snap_id}.zip")
-        try:
-            if hasattr(client, 'projects') and hasattr(client.projects, 'exports'):
-                client.projects.exports.download(id=project_id, export_id=snap_id, path=str(tmp))
-            else:
-                import requests
-                # Try Bearer token first (LS 1.20+), then Token (legacy)
-                for auth_type in ["Bearer", "Token"]:
-                    response = requests.get(
-                        f"{client.url}/api/projects/{project_id}/exports/{snap_id}/download/",
-                        headers={"Authorization": f"{auth_type} {client.api_key}"}
-                    )
-                    if response.status_code != 401:
-                        response.raise_for_status()
-                        tmp.write_bytes(response.content)
-                        break
-                else:
-                    response.raise_for_status()
-                    tmp.write_bytes(response.content)
-            buf = io.BytesIO(tmp.read_bytes())
-        finally:
-            try:
-                tmp.unlink()
-            except Exception:
-                pass
-
-    buf.seek(0)
-    with zipfile.ZipFile(buf) as zf:
-        # Heuristics: try common names first
-        candidate_names = [
-            "tasks.json",
-            "result.json",
-            "export.json",
-            "project.json",  # fallback (may contain metadata, not tasks)
-        ]
-        json_bytes = None
-        for name in candidate_names:
-            try:
-                json_bytes = zf.read(name)
-                break
-            except KeyError:
-                continue
-        if json_bytes is None:
-            # Fallback: first .json in the archive
-            for name in zf.namelist():
-                if name.lower().endswith(".json"):
-                    json_bytes = zf.read(name)
-                    break
-        if json_bytes is None:
-            raise RuntimeError("No JSON file found in snapshot ZIP")
+    def info(self, message: str) -> None:
+        st.info(message)
 
-    try:
-        data = json.loads(json_bytes.decode("utf-8"))
-    except Exception:
-        data = json.loads(json_bytes)
-
-    # Some exports wrap tasks inside a dict; try to detect
-    if isinstance(data, dict):
-        for key in ("tasks", "result", "items", "data"):
-            if key in data and isinstance(data[key], list):
-                data = data[key]
-                break
-    if not isinstance(data, list):
-        raise RuntimeError("Snapshot JSON did not contain a list of tasks")
-    return data
-
-
-# =========================
-# Rewriters & merge
-# =========================
+    def success(self, message: str) -> None:
+        st.success(message)
 
-def apply_key_renames(d: Dict[str, Any], renames: Dict[str, str]) -> Dict[str, Any]:
-    out = dict(d)
-    for old, new in renames.items():
-        if old in out:
-            if new == "":
-                # delete field
-                out.pop(old, None)
-            elif new != old:
-                out[new] = out.pop(old)
-    return out
-
-
-def apply_prefix_url(value: Any, base: str, strip_dirs: bool) -> Any:
-    if not isinstance(value, str):
-        return value
-    v = value
-    if strip_dirs:
-        v = Path(v).name
-    if base.endswith("/"):
-        return base + v
-    else:
-        return base + "/" + v
-
-
-def apply_regex(value: Any, pattern: str, repl: str) -> Any:
-    if not isinstance(value, str):
-        return value
-    try:
-        return re.sub(pattern, repl, value)
-    except re.error:
-        return value
-
-
-def rewrite_task_data(
-    task: Dict[str, Any],
-    renames: Dict[str, str],
-    prefix_field: Optional[str],
-    base_url: Optional[str],
-    strip_dirs: bool,
-    regex_field: Optional[str],
-    regex_pattern: Optional[str],
-    regex_repl: Optional[str],
-) -> Dict[str, Any]:
-    data = dict(task.get("data", {}))
-    data = apply_key_renames(data, renames)
-
-    if prefix_field and base_url and prefix_field in data and isinstance(data[prefix_field], str):
-        data[prefix_field] = apply_prefix_url(data[prefix_field], base_url, strip_dirs)
-
-    if regex_field and regex_pattern is not None and regex_repl is not None:
-        if regex_field in data:
-            data[regex_field] = apply_regex(data[regex_field], regex_pattern, regex_repl)
-
-    new_task = dict(task)
-    new_task["data"] = data
-    return new_task
-
-
-def stable_key(task: Dict[str, Any], dedup_field: Optional[str]) -> str:
-    data = task.get("data", {})
-    if dedup_field and dedup_field in data and data[dedup_field] not in (None, ""):
-        return str(data[dedup_field])
-    blob = json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")
-    return hashlib.sha1(blob).hexdigest()
-
-
-def concat_and_dedup(
-    lists: List[List[Dict[str, Any]]],
-    dedup_field: Optional[str]
-) -> Tuple[List[Dict[str, Any]], int]:
-    seen = set()
-    merged: List[Dict[str, Any]] = []
-    dropped = 0
-    for L in lists:
-        for t in L:
-            k = stable_key(t, dedup_field)
-            if k in seen:
-                dropped += 1
-                continue
-            seen.add(k)
-            merged.append(t)
-    return merged, dropped
-
-
-def create_project(client, title: str, label_config: str, description: str = "") -> int:
-    try:
-        # Try modern SDK first
-        if hasattr(client, 'projects') and hasattr(client.projects, 'create'):
-            p = client.projects.create(title=title, label_config=label_config, description=description)
-        elif hasattr(client, 'create_project'):
-            p = client.create_project(title=title, label_config=label_config, description=description)
-        else:
-            # Fallback to direct API call
-            import requests
-            # Try Bearer token first (LS 1.20+), then Token (legacy)
-            for auth_type in ["Bearer", "Token"]:
-                response = requests.post(
-                    f"{client.url}/api/projects/",
-                    headers={"Authorization": f"{auth_type} {client.api_key}"},
-                    json={
-                        'title': title,
-                        'label_config': label_config,
-                        'description': description
-                    }
-                )
-                if response.status_code != 401:
-                    response.raise_for_status()
-                    p = response.json()
-                    break
-            else:
-                response.raise_for_status()
-                p = response.json()
-        
-        return int(_safe_attr(p, "id"))
-    except Exception as e:
-        raise RuntimeError(f"Failed to create project: {e}")
+    def warning(self, message: str) -> None:
+        st.warning(message)
 
+    def error(self, message: str) -> None:
+        st.error(message)
 
-def import_in_batches(client, project_id: int, items: List[Dict[str, Any]], batch: int = 1000, progress=None):
-    total = len(items)
-    sent = 0
-    for i in range(0, total, batch):
-        payload = items[i : i + batch]
-        try:
-            # Try modern SDK first
-            if hasattr(client, 'projects') and hasattr(client.projects, 'import_tasks'):
-                client.projects.import_tasks(id=project_id, request=payload, return_task_ids=False)
-            elif hasattr(client, 'import_tasks'):
-                client.import_tasks(project_id, payload)
-            else:
-                # Fallback to direct API call
-                import requests
-                # Try Bearer token first (LS 1.20+), then Token (legacy)
-                for auth_type in ["Bearer", "Token"]:
-                    response = requests.post(
-                        f"{client.url}/api/projects/{project_id}/import",
-                        headers={"Authorization": f"{auth_type} {client.api_key}"},
-                        json=payload
-                    )
-                    if response.status_code != 401:
-                        response.raise_for_status()
-                        break
-                else:
-                    response.raise_for_status()
-        except Exception as e:
-            raise RuntimeError(f"Failed to import batch {i//batch + 1}: {e}")
-            
-        sent += len(payload)
-        if progress is not None:
-            progress.progress(min(int(sent / total * 100), 100), text=f"Imported {sent}/{total}")
-
-
-def projects_dataframe(projects: List[Any]) -> pd.DataFrame:
-    rows = []
-    for p in projects:
-        rows.append(
-            dict(
-                id=_safe_attr(p, "id"),
-                title=_safe_attr(p, "title"),
-                description=_safe_attr(p, "description"),
-                created_at=_safe_attr(p, "created_at"),
-                updated_at=_safe_attr(p, "updated_at"),
-                task_number=_safe_attr(p, "task_number"),
-                annotation_number=_safe_attr(p, "annotation_number"),
-            )
-        )
-    return pd.DataFrame(rows)
+    def thread_initializer(self):
+        # Worker threads need the script run context to call st.*
+        ctx = get_script_run_ctx() if get_script_run_ctx else None
+        if ctx is None:
+            return lambda: None
+        return lambda: add_script_run_ctx(threading.current_thread(), ctx)
 
 
-@st.cache_data(show_spinner=False)
-def get_project_summary(client, project_id: int) -> Dict[str, Any]:
-    """Get detailed project summary including accurate annotation count"""
-    try:
-        project = get_project(client, project_id)
-        
-        # Get accurate task and annotation counts
-        task_count = 0
-        annotation_count = 0
-        
-        try:
-            # Try to get summary from project first
-            task_count = _safe_attr(project, "task_number", 0) or 0
-            annotation_count = _safe_attr(project, "annotation_number", 0) or 0
-            
-            # If annotation count is 0 or None, do manual count
-            if annotation_count == 0:
-                st.info(f"Counting annotations for project {project_id}...")
-                annotation_count = 0
-                task_count = 0
-                
-                for task in tasks_iter(client, project_id, fields="annotations", page_size=1000):
-                    task_count += 1
-                    annotations = _safe_attr(task, "annotations", [])
-                    if annotations:
-                        annotation_count += len(annotations)
-        except Exception as e:
-            st.warning(f"Could not count annotations for project {project_id}: {e}")
-        
-        return {
-            "id": _safe_attr(project, "id"),
-            "title": _safe_attr(project, "title"),
-            "description": _safe_attr(project, "description"),
-            "task_count": task_count,
-            "annotation_count": annotation_count,
-            "label_config": label_config_of(project)
-        }
-    except Exception as e:
-        return {
-            "id": project_id,
-            "title": f"Error loading project {project_id}",
-            "description": str(e),
-            "task_count": 0,
-            "annotation_count": 0,
-            "label_config": ""
-        }
+set_reporter(StreamlitReporter())
 
 
 # =========================
@@ -946,6 +95,28 @@ with st.sidebar:
     st.subheader("🔐 Connect")
     base_url = st.text_input("Base URL", value="http://localhost:8082")
     api_key = st.text_input("API Key (Personal Token)", type="password")
+    pool_size = st.number_input(
+        "HTTP connection pool size",
+        min_value=1,
+        max_value=128,
+        value=HTTP_POOL_SIZE,
+        help="Keep-alive connections reused across pages, batches and projects",
+    )
+    retry_attempts = st.number_input(
+        "Retry attempts",
+        min_value=1,
+        max_value=10,
+        value=DEFAULT_RETRY.attempts,
+        help="Tries per API call on timeouts, 429 and 5xx responses (imports only retry when the server refused them)",
+    )
+    retry_backoff = st.number_input(
+        "Retry backoff (s)", min_value=0.1, max_value=30.0, value=DEFAULT_RETRY.backoff, step=0.1
+    )
+    with st.expander("Server rate limits"):
+        st.caption("Shared by all operations and all sessions of this app against the same Base URL")
+        rate_limit = st.number_input("Max requests per second (0 = unlimited)", min_value=0.0, max_value=1000.0, value=0.0, step=1.0)
+        rate_burst = st.number_input("Burst size", min_value=1, max_value=1000, value=10)
+        max_in_flight = st.number_input("Max requests in flight (0 = unlimited)", min_value=0, max_value=256, value=0)
     
     col1, col2 = st.columns(2)
     with col1:
@@ -966,7 +137,8 @@ with st.sidebar:
 
 if "client" not in st.session_state and connect_btn:
     try:
-        st.session_state.client = connect_ls(base_url.strip(), api_key.strip())
+        # The client is shared by all sessions; the view keeps this session's retry settings
+        st.session_state.client = ClientView(connect_ls(base_url.strip(), api_key.strip(), int(pool_size)))
         st.success("Connected.")
     except Exception as e:
         st.error(str(e))
@@ -975,6 +147,13 @@ client = st.session_state.get("client")
 if not client:
     st.info("Enter your Label Studio URL and API Key in the sidebar to get started.")
     st.stop()
+client.retry_policy = RetryPolicy(attempts=int(retry_attempts), backoff=float(retry_backoff))
+# The governor is shared per server: only this session's changes are applied, so
+# another session left on the defaults does not reset limits set elsewhere
+rate_limits = (float(rate_limit), int(rate_burst), int(max_in_flight))
+if rate_limits != st.session_state.get("rate_limits", (0.0, 10, 0)):
+    rate_governor(client.url).configure(*rate_limits)
+st.session_state.rate_limits = rate_limits
 
 # Initialize session state for projects
 if "projects_loaded" not in st.session_state:
@@ -1002,7 +181,8 @@ with col2:
 if load_projects_btn:
     try:
         with st.spinner("Loading projects..."):
-            projs = list_projects(client)
+            # Explicit reload: bypass the metadata cache to pick up projects created elsewhere
+            projs = list_projects(client, refresh=True)
             st.session_state.projects_list = projs
             st.session_state.projects_loaded = True
             st.rerun()
@@ -1034,11 +214,10 @@ with colA:
         
         if get_details_btn:
             selected_ids = [proj_options[label] for label in selected_labels]
+            # Served from the metadata cache unless expired or invalidated by an import
             with st.spinner("Getting project details..."):
-                for project_id in selected_ids:
-                    if project_id not in st.session_state.selected_project_details:
-                        details = get_project_summary(client, project_id)
-                        st.session_state.selected_project_details[project_id] = details
+                for project_id, details in zip(selected_ids, project_summaries(client, selected_ids)):
+                    st.session_state.selected_project_details[project_id] = details
         
         # Display cached details
         total_tasks = 0
@@ -1081,6 +260,17 @@ with colC:
 tab1, tab2, tab3 = st.tabs(["📤 Export & Merge", "✏️ Field Rewriter", "🔧 Advanced Options"])
 
 with tab1:
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        parallel_export = st.checkbox("Export projects in parallel", value=True)
+    with col2:
+        export_workers = st.number_input(
+            "Parallel exports",
+            min_value=1,
+            max_value=16,
+            value=EXPORT_WORKERS,
+            help="Projects exported at once; keep at or below the HTTP connection pool size",
+        )
     export_btn = st.button("Export selected ➜ Apply rewrites ➜ JSON (preview below)", type="primary")
 
 with tab2:
@@ -1101,6 +291,32 @@ with tab2:
         regex_pattern = st.text_input("Pattern", value="")
         regex_repl = st.text_input("Replacement", value="")
 
+    st.markdown("#### Additional rules")
+    st.caption(
+        "Applied in order after the settings above. Dots in a field reach nested keys (e.g. `meta.image`); "
+        "an empty 'To' deletes the field. 'When field' / 'When pattern' limit a rule to tasks whose field matches the regex."
+    )
+    rules_df = st.data_editor(
+        pd.DataFrame({
+            c: pd.Series(dtype="bool" if c == "strip_dirs" else "object")
+            for c in ["op", "field", "to", "base", "strip_dirs", "pattern", "repl", "when_field", "when_pattern"]
+        }),
+        num_rows="dynamic",
+        use_container_width=True,
+        key="rewrite_rules",
+        column_config={
+            "op": st.column_config.SelectboxColumn("Op", options=list(RULE_OPS), required=True),
+            "field": st.column_config.TextColumn("Field"),
+            "to": st.column_config.TextColumn("To (rename)"),
+            "base": st.column_config.TextColumn("Base URL (prefix)"),
+            "strip_dirs": st.column_config.CheckboxColumn("Strip dirs (prefix)", default=True),
+            "pattern": st.column_config.TextColumn("Pattern (regex)"),
+            "repl": st.column_config.TextColumn("Replacement (regex)"),
+            "when_field": st.column_config.TextColumn("When field"),
+            "when_pattern": st.column_config.TextColumn("When pattern"),
+        },
+    )
+
 with tab3:
     col1, col2 = st.columns([1, 1])
     with col1:
@@ -1108,10 +324,48 @@ with tab3:
         use_snapshot = st.checkbox("Use snapshot export (recommended for large projects)", value=False)
         include_annotations = st.checkbox("Include annotations (stream mode)", value=True)
         include_predictions = st.checkbox("Include predictions (stream mode)", value=False)
+        prefetch_pages = st.number_input(
+            "Prefetch pages (stream mode)",
+            min_value=0,
+            max_value=32,
+            value=4,
+            help="Task pages fetched concurrently per project; 0 fetches pages one after another",
+        )
+        use_task_cache = st.checkbox(
+            "Local task cache (incremental re-export)",
+            value=True,
+            help="Keep exported tasks in ~/.ls_project_tool/tasks.sqlite and re-download only tasks updated since the last export (stream mode, threaded engine)",
+        )
+        use_async_engine = st.checkbox(
+            "Async I/O engine (aiohttp)",
+            value=False,
+            help="Run all project/page requests on one event loop instead of worker threads",
+        )
     
     with col2:
         st.subheader("Deduplication")
         dedup_field = st.text_input("De-dup field in data (optional)", value="image", help="e.g., 'image', 'text', 'audio'. Leave empty to hash the data dict.")
+        near_dup_images = st.checkbox(
+            "Near-duplicate images (perceptual hash)",
+            value=False,
+            help="Also drop re-encoded or re-located copies of the same photo in the de-dup field. Downloads each image once; needs Pillow and numpy.",
+        )
+        near_dup_distance = st.slider(
+            "Max differing hash bits", min_value=0, max_value=16, value=DEFAULT_DISTANCE, disabled=not near_dup_images
+        )
+        near_dup_workers = st.number_input(
+            "Hashing processes", min_value=1, max_value=64, value=os.cpu_count() or 4, disabled=not near_dup_images
+        )
+        if near_dup_images and not dedup_field.strip():
+            st.warning("Near-duplicate detection needs the de-dup field to name the image field.")
+        parallel_rewrite = st.checkbox(
+            "Parallel rewrite & de-dup keys (processes)",
+            value=False,
+            help=f"Shard rewriting and key hashing across worker processes for merges of at least {PARALLEL_MIN_TASKS:,} tasks; smaller merges run in-process",
+        )
+        rewrite_processes = st.number_input(
+            "Rewrite processes", min_value=1, max_value=128, value=os.cpu_count() or 4, disabled=not parallel_rewrite
+        )
 
 merged: List[Dict[str, Any]] = []
 dropped = 0
@@ -1125,6 +379,47 @@ if renames_str.strip():
             old, new = part.split(":", 1)
             renames[old.strip()] = new.strip()
 
+# Rows of the additional rules table; blank cells are left out of the rule
+extra_rules: List[Dict[str, Any]] = []
+for row in rules_df.to_dict("records"):
+    if not isinstance(row.get("op"), str) or not row["op"]:
+        continue
+    # Patterns and replacements are kept verbatim; whitespace may be significant there
+    rule = {
+        k: v if k in ("pattern", "repl", "when_pattern") else v.strip()
+        for k, v in row.items()
+        if isinstance(v, str) and v != ""
+    }
+    if row.get("strip_dirs") in (True, False):
+        rule["strip_dirs"] = bool(row["strip_dirs"])
+    extra_rules.append(rule)
+
+
+# Compile the Field Rewriter tab settings once per run
+try:
+    rewrite_plan = RewritePlan.from_settings(
+        renames=renames,
+        prefix_field=prefix_field.strip() or None,
+        base_url=base_url.strip() or None,
+        strip_dirs=strip_dirs,
+        regex_field=regex_field.strip() or None,
+        regex_pattern=regex_pattern if regex_pattern else None,
+        regex_repl=regex_repl if regex_repl else None,
+        extra_rules=extra_rules,
+    )
+    rewrite_error = None
+except RuntimeError as e:
+    rewrite_plan = None
+    rewrite_error = str(e)
+    st.error(f"Field Rewriter: {rewrite_error}")
+
+
+def rewrite_selected(t: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply the Field Rewriter tab settings to one task."""
+    if rewrite_plan is None:
+        raise RuntimeError(rewrite_error)
+    return rewrite_plan.apply(t)
+
 if export_btn:
     if not selected_labels:
         st.warning("Select at least one source project.")
@@ -1142,44 +437,86 @@ if export_btn:
             progress_bar = st.progress(0)
             status_text = st.empty()
             
+        def export_one(pid: int, on_progress=None) -> List[Dict[str, Any]]:
+            if use_snapshot:
+                return build_export_snapshot(client, project_id=pid)
+            return build_export_stream(
+                client,
+                project_id=pid,
+                include_annotations=include_annotations,
+                include_predictions=include_predictions,
+                on_progress=on_progress,
+                prefetch=int(prefetch_pages),
+                cache=task_cache() if use_task_cache else None,
+            )
+            
+        async def export_all_async() -> List[List[Dict[str, Any]]]:
+            async with async_client(client) as ls:
+                return await ls.export_projects(
+                    ids,
+                    use_snapshot=use_snapshot,
+                    include_annotations=include_annotations,
+                    include_predictions=include_predictions,
+                    concurrency=int(export_workers) if parallel_export else 1,
+                    prefetch=max(int(prefetch_pages), 1),
+                )
+            
         try:
-            for i, (pid, label) in enumerate(zip(ids, selected_labels)):
-                progress = (i / len(ids)) * 0.8  # Reserve 20% for post-processing
-                progress_bar.progress(progress)
-                status_text.text(f"Exporting project {i+1}/{len(ids)}: {label}")
+            if use_async_engine:
+                status_text.text(f"Exporting {len(ids)} projects (async engine)...")
+                data_lists = run_async(export_all_async())
+                progress_bar.progress(0.8)
+            elif parallel_export and len(ids) > 1:
+                status_text.text(f"Exporting {len(ids)} projects ({int(export_workers)} at a time)...")
+                with progress_container:
+                    project_lines = {pid: st.empty() for pid in ids}
                 
-                if use_snapshot:
-                    data_list = build_export_snapshot(client, project_id=pid)
-                else:
-                    data_list = build_export_stream(
-                        client,
-                        project_id=pid,
-                        include_annotations=include_annotations,
-                        include_predictions=include_predictions,
-                    )
-                
-                status_text.text(f"Applying rewrites to {len(data_list)} tasks from {label}...")
+                def show_export_state(state):
+                    finished = sum(1 for v in state.values() if v["status"] == "done")
+                    progress_bar.progress((finished / len(ids)) * 0.8)
+                    for pid, label in zip(ids, selected_labels):
+                        v = state[pid]
+                        project_lines[pid].text(f"{label}: {v['status']} ({v['tasks']} tasks)")
                 
-                # Apply rewrites to each task
-                rewritten = [
-                    rewrite_task_data(
-                        t,
-                        renames=renames,
-                        prefix_field=prefix_field.strip() or None,
-                        base_url=base_url.strip() or None,
-                        strip_dirs=strip_dirs,
-                        regex_field=regex_field.strip() or None,
-                        regex_pattern=regex_pattern if regex_pattern else None,
-                        regex_repl=regex_repl if regex_repl else None,
-                    )
-                    for t in data_list
-                ]
-                exports.append(rewritten)
+                data_lists = export_projects_parallel(
+                    ids, export_one, max_workers=int(export_workers), on_update=show_export_state
+                )
+            else:
+                data_lists = []
+                for i, (pid, label) in enumerate(zip(ids, selected_labels)):
+                    progress = (i / len(ids)) * 0.8  # Reserve 20% for post-processing
+                    progress_bar.progress(progress)
+                    status_text.text(f"Exporting project {i+1}/{len(ids)}: {label}")
+                    data_lists.append(export_one(pid))
+            
+            if rewrite_plan is None:
+                raise RuntimeError(rewrite_error)
+            total_tasks = sum(len(l) for l in data_lists)
+            keys = None
+            if parallel_rewrite and total_tasks >= PARALLEL_MIN_TASKS:
+                status_text.text(f"Applying rewrites to {total_tasks} tasks on {int(rewrite_processes)} processes...")
+                exports, keys = rewrite_keyed_lists(
+                    data_lists, rewrite_plan, dedup_field if dedup_field.strip() else None, workers=int(rewrite_processes)
+                )
+            else:
+                for data_list, label in zip(data_lists, selected_labels):
+                    status_text.text(f"Applying rewrites to {len(data_list)} tasks from {label}...")
+                    
+                    # Apply rewrites to each task
+                    rewritten = rewrite_plan.apply_many(data_list)
+                    exports.append(rewritten)
             
             # Final processing
             progress_bar.progress(0.9)
             status_text.text("Merging and de-duplicating...")
-            merged, dropped = concat_and_dedup(exports, dedup_field if dedup_field.strip() else None)
+            merged, dropped = concat_and_dedup(exports, dedup_field if dedup_field.strip() else None, keys=keys)
+            if near_dup_images and dedup_field.strip():
+                status_text.text(f"Hashing {len(merged)} images for near-duplicates...")
+                near_stats: Dict[str, int] = {}
+                merged = list(near_dedup(client, merged, dedup_field.strip(), int(near_dup_distance), int(near_dup_workers), near_stats))
+                dropped += near_stats["near_dropped"]
+                if near_stats["unhashed"]:
+                    st.info(f"{near_stats['unhashed']} images could not be fetched for hashing and were kept.")
             
             progress_bar.progress(1.0)
             status_text.text("✅ Export complete!")
@@ -1188,7 +525,8 @@ if export_btn:
             st.session_state.exported_data = {
                 "merged": merged, 
                 "exports": exports, 
-                "dropped": dropped
+                "dropped": dropped,
+                "fingerprint": fingerprint_tasks(merged),
             }
             
             st.success(f"Exported and merged {len(merged)} tasks (dropped {dropped} duplicates)")
@@ -1257,6 +595,26 @@ with col1:
     )
 with col2:
     batch_size = st.number_input("Import batch size", min_value=100, max_value=50000, step=100, value=2000)
+    import_workers = st.number_input(
+        "Parallel import batches",
+        min_value=1,
+        max_value=16,
+        value=1,
+        help="Batches POSTed to Label Studio at once",
+    )
+    adaptive_batches = st.checkbox(
+        "Adaptive batch size (by payload bytes)",
+        value=False,
+        help="Pack batches by serialized size and grow/shrink them with server latency; "
+             "the batch size above becomes the maximum tasks per batch",
+    )
+    batch_budget_mb = st.number_input("Initial batch budget (MB)", min_value=1, max_value=64, value=4)
+    streaming_pipeline = st.checkbox(
+        "Streaming pipeline (low memory)",
+        value=False,
+        help="Export ➜ rewrite ➜ de-dup ➜ import task by task without holding projects in memory. "
+             "Skips the preview/download step.",
+    )
 
 # Enable create button if we have selected projects and exported data
 merged = st.session_state.exported_data.get("merged", [])
@@ -1268,12 +626,14 @@ has_projects = len(selected_labels) >= 2
 has_exported_data = len(merged) > 0
 has_compatible_config = st.session_state.get('config_compatible', False)
 
-can_create = has_projects and has_exported_data and has_compatible_config
+can_create = has_projects and (has_exported_data or streaming_pipeline) and has_compatible_config
 
 if not has_projects:
     button_help = "Select at least 2 projects to merge"
 elif not has_compatible_config:
     button_help = "Check label config compatibility first"
+elif streaming_pipeline:
+    button_help = "Create new project and stream the selected projects into it"
 elif not has_exported_data:
     button_help = "Export projects first to enable merge"
 else:
@@ -1344,6 +704,111 @@ if len(selected_labels) >= 2:
                             else:
                                 st.write("(empty or no config)")
 
+def streaming_sources() -> List[Iterable[Dict[str, Any]]]:
+    """Lazy per-project task iterators for the streaming pipeline."""
+    snapshot = st.session_state.get('quick_snapshot', use_snapshot)
+    annotations = st.session_state.get('quick_annotations', include_annotations)
+    return [
+        iter_export_snapshot(client, proj_options[k]) if snapshot else iter_export_stream(
+            client,
+            proj_options[k],
+            include_annotations=annotations,
+            include_predictions=include_predictions,
+            prefetch=int(prefetch_pages),
+            cache=task_cache() if use_task_cache else None,
+        )
+        for k in selected_labels
+    ]
+
+
+# Identifies the task stream being imported, so an interrupted import can be resumed
+if streaming_pipeline:
+    import_fingerprint = fingerprint_config({
+        "projects": [proj_options[k] for k in selected_labels],
+        "snapshot": st.session_state.get('quick_snapshot', use_snapshot),
+        "annotations": st.session_state.get('quick_annotations', include_annotations),
+        "predictions": include_predictions,
+        "rewrite": [renames, prefix_field, base_url, strip_dirs, regex_field, regex_pattern, regex_repl, extra_rules],
+        "dedup_field": dedup_field,
+        "near_dup": int(near_dup_distance) if near_dup_images else None,
+    })
+else:
+    import_fingerprint = st.session_state.exported_data.get("fingerprint")
+
+
+def run_import(dst_id: int, journal: ImportJournal) -> None:
+    """Import the merged (or streamed) tasks into `dst_id`, checkpointing in `journal`."""
+    progress = st.progress(0, text="Starting import...")
+    import_byte_budget = int(batch_budget_mb) << 20 if adaptive_batches else None
+    try:
+        if streaming_pipeline:
+            ids = [proj_options[k] for k in selected_labels]
+            # Size estimate for progress, the dedup index and the parallel-rewrite threshold:
+            # detailed counts where fetched, otherwise the project listing's task_number
+            details = st.session_state.selected_project_details
+            listed = {int(_safe_attr(p, "id")): _safe_attr(p, "task_number") for p in st.session_state.projects_list}
+            counts = [details[pid]["task_count"] if pid in details else listed.get(pid) for pid in ids]
+            estimate = sum(counts) if all(isinstance(c, int) for c in counts) else None
+            imported, dropped = stream_merge_import(
+                client,
+                dst_id,
+                streaming_sources(),
+                rewrite_selected,
+                dedup_field if dedup_field.strip() else None,
+                batch=batch_size,
+                progress=progress,
+                total=estimate,
+                workers=int(import_workers),
+                byte_budget=import_byte_budget,
+                journal=journal,
+                near_dup_distance=int(near_dup_distance) if near_dup_images else None,
+                near_dup_workers=int(near_dup_workers),
+                # Unknown totals are treated as large: the user opted in to process parallelism
+                parallel_plan=rewrite_plan if parallel_rewrite and (estimate is None or estimate >= PARALLEL_MIN_TASKS) else None,
+                processes=int(rewrite_processes),
+            )
+            journal.complete()
+            progress.progress(100, text="Done")
+            st.success(f"Imported {imported} tasks into project {dst_id} (dropped {dropped} duplicates).")
+        else:
+            import_in_batches(
+                client,
+                dst_id,
+                merged,
+                batch=batch_size,
+                progress=progress,
+                workers=int(import_workers),
+                byte_budget=import_byte_budget,
+                journal=journal,
+            )
+            journal.complete()
+            progress.progress(100, text="Done")
+            st.success(f"Imported {len(merged)} tasks into project {dst_id}.")
+    except ImportBatchError as e:
+        st.error(str(e))
+        st.info(f"Progress is checkpointed in {journal.path}. Use \"Resume import\" to send only the remaining batches.")
+
+
+# Offer to finish an interrupted import of the same task stream
+pending_journal = ImportJournal.find(client.url, import_fingerprint) if import_fingerprint else None
+if pending_journal is not None:
+    total_txt = f"/{pending_journal.state['total']}" if pending_journal.state.get("total") else ""
+    st.warning(
+        f"Interrupted import into project {pending_journal.project_id}: "
+        f"{pending_journal.committed_count}{total_txt} tasks committed."
+    )
+    if st.button("⏯️ Resume import", help="Send only the batches not yet committed, into the same project"):
+        if streaming_pipeline and pending_journal.sources_changed(
+            source_state(client, [proj_options[k] for k in selected_labels])
+        ):
+            # The deduped stream would no longer line up with the committed offsets
+            st.error(
+                "Source projects changed since the interrupted import (tasks added, removed or edited); "
+                "resuming would skip or duplicate tasks. Create a new merged project instead."
+            )
+        else:
+            run_import(pending_journal.project_id, pending_journal)
+
 if create_btn:
     # Validate prerequisites
     if len(selected_labels) < 2:
@@ -1354,7 +819,7 @@ if create_btn:
         st.error("Please check label config compatibility first.")
         st.stop()
     
-    if len(merged) == 0:
+    if len(merged) == 0 and not streaming_pipeline:
         st.error("Please export projects first.")
         st.stop()
 
@@ -1377,9 +842,13 @@ if create_btn:
         )
         st.caption(warn)
 
-        progress = st.progress(0, text="Starting import...")
-        import_in_batches(client, dst_id, merged, batch=batch_size, progress=progress)
-        progress.progress(100, text="Done")
-        st.success(f"Imported {len(merged)} tasks into project {dst_id}.")
+        journal = ImportJournal.create(
+            client.url,
+            dst_id,
+            import_fingerprint,
+            total=None if streaming_pipeline else len(merged),
+            sources=source_state(client, [proj_options[k] for k in selected_labels]) if streaming_pipeline else None,
+        )
+        run_import(dst_id, journal)
     except Exception as e:
         st.error(str(e))
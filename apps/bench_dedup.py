@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark dedup hashing: the original json.dumps + SHA-1 hex keys vs ls_dedup
+(in-memory set and the on-disk spill index)
+Run: python bench_dedup.py [num_tasks] [duplicate_ratio]
+"""
+import hashlib
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from ls_dedup import DEDUP_SPILL_THRESHOLD, DIGEST_NAME, dedup_iter
+
+
+def make_tasks(n, dup_ratio):
+    """Synthetic image tasks with a share of exact duplicates"""
+    rng = random.Random(42)
+    unique = max(1, int(n * (1 - dup_ratio)))
+    base = [
+        {
+            "data": {
+                "image": f"https://storage.example.org/coral/survey_{i // 1000}/img_{i:08d}.jpg",
+                "site": f"site-{rng.randint(1, 500)}",
+                "depth_m": round(rng.uniform(1, 40), 2),
+                "meta": {"camera": "GoPro", "frame": i, "tags": ["reef", "transect"]},
+            }
+        }
+        for i in range(unique)
+    ]
+    return [base[i % unique] for i in range(n)]
+
+
+def legacy_dedup(tasks):
+    """Pre-ls_dedup implementation (sorted json.dumps + SHA-1 hex string keys)"""
+    seen = set()
+    out = []
+    for t in tasks:
+        blob = json.dumps(t.get("data", {}), sort_keys=True, ensure_ascii=False).encode("utf-8")
+        k = hashlib.sha1(blob).hexdigest()
+        if k in seen:
+            continue
+        seen.add(k)
+        out.append(t)
+    return out, seen
+
+
+def fast_dedup(tasks):
+    return list(dedup_iter(tasks, None)), None
+
+
+def spill_dedup(tasks):
+    # Force the SQLite + Bloom index regardless of size
+    return list(dedup_iter(tasks, None, estimated_keys=max(len(tasks), DEDUP_SPILL_THRESHOLD + 1))), None
+
+
+def run(name, fn, tasks):
+    start = time.perf_counter()
+    kept, _ = fn(tasks)
+    elapsed = time.perf_counter() - start
+    # Memory is measured in a second pass; tracemalloc slows the timed one down
+    tracemalloc.start()
+    fn(tasks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   {name:<28} {elapsed:8.2f}s  {len(tasks) / elapsed:>12,.0f} tasks/s  peak {peak / 1e6:8.1f} MB  kept {len(kept):,}")
+    return elapsed
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    dup_ratio = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+
+    print(f"Dedup benchmark: {n:,} tasks, {dup_ratio:.0%} duplicates")
+    print("-" * 60)
+    tasks = make_tasks(n, dup_ratio)
+
+    legacy = run("json.dumps + sha1 hex", legacy_dedup, tasks)
+    fast = run(f"ls_dedup ({DIGEST_NAME})", fast_dedup, tasks)
+    run("ls_dedup spill (SQLite+Bloom)", spill_dedup, tasks)
+
+    print("-" * 60)
+    print(f"Speedup: {legacy / fast:.2f}x")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Regression check: tasks_iter over the SDK's own SyncPagerExt
+(needs label-studio-sdk; no server). The SDK pager asks for one page past
+the end and gets 404 "Invalid page", which must end the task list.
+Run: python check_sdk_pager.py [num_tasks] [page_size]
+"""
+import sys
+from types import SimpleNamespace
+
+from label_studio_sdk._extensions.pager_ext import SyncPagerExt
+from label_studio_sdk.core.api_error import ApiError
+
+from ls_api import RetryPolicy, tasks_iter
+
+
+def make_pager(num_tasks, page_size, calls, flaky_page=None):
+    """SDK 1.x paging: has_next while the page was non-empty, 404 past the end"""
+    def page(n):
+        calls.append(n)
+        if flaky_page == n and calls.count(n) == 1:
+            raise ApiError(status_code=503, body="Service Unavailable")
+        items = [{"id": i} for i in range((n - 1) * page_size, min(n * page_size, num_tasks))]
+        if not items:
+            raise ApiError(status_code=404, body={"detail": "Invalid page."})
+        return SyncPagerExt(get_next=lambda: page(n + 1), has_next=True, items=items, response=None)
+
+    return page(1)
+
+
+def make_client(num_tasks, page_size, calls, flaky_page=None):
+    tasks = SimpleNamespace(list=lambda **kwargs: make_pager(num_tasks, page_size, calls, flaky_page))
+    return SimpleNamespace(
+        url="http://ls.invalid", tasks=tasks, retry_policy=RetryPolicy(attempts=3, backoff=0.0)
+    )
+
+
+def main():
+    num_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 1234
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    calls = []
+    direct = list(make_pager(num_tasks, page_size, calls))
+    assert len(direct) == num_tasks, f"SDK iteration: {len(direct)} of {num_tasks}"
+
+    calls = []
+    ids = [t["id"] for t in tasks_iter(make_client(num_tasks, page_size, calls), 1, page_size=page_size)]
+    assert ids == list(range(num_tasks)), f"tasks_iter: {len(ids)} of {num_tasks}"
+    print(f"tasks_iter: {len(ids)} tasks in {len(calls)} page requests (last one 404)")
+
+    calls = []
+    ids = [t["id"] for t in tasks_iter(make_client(num_tasks, page_size, calls, flaky_page=2), 1, page_size=page_size)]
+    assert ids == list(range(num_tasks)), f"tasks_iter with a 503: {len(ids)} of {num_tasks}"
+    assert calls.count(2) == 2, "a 503 on a later page was not retried"
+    print("tasks_iter: 503 on page 2 retried, all tasks returned")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1856 @@
+"""Label Studio API layer: transport, auth, export, merge and import.
+
+UI-free, so the same code runs in the Streamlit app (app.py) and headless
+(ls_cli.py). User-facing messages go through the current Reporter (see
+set_reporter); the default one logs via the `ls_api` logger. Process-wide
+shared objects (HTTP sessions, rate governors) live in a locked module-level
+cache rather than a UI framework cache.
+"""
+import base64
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import email.utils
+import functools
+import hashlib
+import itertools
+import random
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from ls_async import AsyncLabelStudio
+from ls_export import iter_snapshot_tasks, task_projection
+from ls_dedup import dedup_iter, dedup_keyed_iter, task_key
+from ls_journal import ImportJournal
+from ls_parallel import iter_rewrite_keyed
+from ls_phash import DEFAULT_DISTANCE, near_dedup_iter
+from ls_rewrite import RewritePlan
+from ls_task_cache import TASK_CACHE, TaskCache
+
+log = logging.getLogger("ls_api")
+
+# ---- Label Studio SDK: handle both "Client" and older "LabelStudio" naming ----
+ClientType = None
+try:
+    from label_studio_sdk import Client as _Client
+    ClientType = _Client
+except Exception:
+    try:
+        from label_studio_sdk import LabelStudio as _Client
+        ClientType = _Client
+    except Exception:
+        ClientType = None
+
+
+# =========================
+# Reporting & shared resources
+# =========================
+
+class Reporter:
+    """Sink for user-facing messages from the API layer. The base class logs;
+    the Streamlit app installs one that renders them (see set_reporter).
+    """
+
+    def write(self, message: str) -> None:
+        log.info(message)
+
+    def info(self, message: str) -> None:
+        log.info(message)
+
+    def success(self, message: str) -> None:
+        log.info(message)
+
+    def warning(self, message: str) -> None:
+        log.warning(message)
+
+    def error(self, message: str) -> None:
+        log.error(message)
+
+    def thread_initializer(self) -> Callable[[], None]:
+        """Called in the caller's thread; the returned callable runs first in each
+        worker thread that may report (e.g. to attach a UI context)."""
+        return lambda: None
+
+
+_reporter: Reporter = Reporter()
+
+
+def set_reporter(reporter: Reporter) -> None:
+    global _reporter
+    _reporter = reporter
+
+
+def report() -> Reporter:
+    return _reporter
+
+
+_RESOURCES: Dict[Tuple[Any, ...], Any] = {}
+_RESOURCES_LOCK = threading.Lock()
+
+
+def shared_resource(fn: Optional[Callable] = None, *, key: Optional[Callable[..., Tuple]] = None) -> Callable:
+    """Memoize `fn` by its positional arguments for the life of the process
+    (one HTTP session / rate governor per server, shared by every caller).
+    With `key`, the memo key is `key(*args)` instead, e.g. to hash a secret.
+    """
+    if fn is None:
+        return functools.partial(shared_resource, key=key)
+
+    @functools.wraps(fn)
+    def wrapper(*args):
+        memo_key = (fn.__name__,) + (key(*args) if key is not None else args)
+        with _RESOURCES_LOCK:
+            if memo_key not in _RESOURCES:
+                _RESOURCES[memo_key] = fn(*args)
+            return _RESOURCES[memo_key]
+
+    return wrapper
+
+
+# =========================
+# HTTP transport
+# =========================
+HTTP_POOL_SIZE = 16
+HTTP_TIMEOUT = (10, 300)  # (connect, read) seconds
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Statuses that mean the server refused the request outright, so even a
+# non-idempotent POST (e.g. an import) is safe to send again
+REJECTED_STATUSES = frozenset({429, 503})
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for transient Label Studio failures.
+    Delay for attempt n is uniform in [0, min(max_backoff, backoff * 2**(n-1))],
+    unless the server sent Retry-After, which wins (capped at max_backoff).
+    """
+
+    def __init__(
+        self,
+        attempts: int = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        statuses: Iterable[int] = (429, 500, 502, 503, 504),
+    ):
+        self.attempts = max(1, int(attempts))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    when = email.utils.parsedate_to_datetime(retry_after).timestamp()
+                    return min(self.max_backoff, max(0.0, when - time.time()))
+                except Exception:
+                    pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+DEFAULT_RETRY = RetryPolicy()
+NO_RETRY = RetryPolicy(attempts=1)
+
+
+class RateGovernor:
+    """Client-side limits for one Label Studio server, shared by every operation
+    and every browser session in this process: a token bucket (`rate` requests/s,
+    bursts up to `burst`) plus a cap on requests in flight. 0 disables a limit.
+    Limits can be changed while requests are waiting.
+    """
+
+    def __init__(self, rate: float = 0, burst: int = 10, max_in_flight: int = 0):
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._stamp = time.monotonic()
+        self.configure(rate, burst, max_in_flight)
+        self._tokens = float(self.burst)
+
+    def configure(self, rate: float, burst: int, max_in_flight: int) -> None:
+        with self._cond:
+            self.rate = float(rate)
+            self.burst = max(1, int(burst))
+            self.max_in_flight = int(max_in_flight)
+            self._cond.notify_all()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.rate > 0:
+                    self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                slot_free = self.max_in_flight <= 0 or self._in_flight < self.max_in_flight
+                token_free = self.rate <= 0 or self._tokens >= 1
+                if slot_free and token_free:
+                    if self.rate > 0:
+                        self._tokens -= 1
+                    self._in_flight += 1
+                    return
+                # Wake on release, or when the next token is due
+                self._cond.wait(None if not slot_free else (1 - self._tokens) / self.rate)
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+@shared_resource
+def rate_governor(base_url: str) -> RateGovernor:
+    """The RateGovernor for a server (one per base URL per process)."""
+    return RateGovernor()
+
+
+def _error_status(exc: Exception) -> Optional[int]:
+    """HTTP status carried by a requests or SDK exception, if any."""
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status_code", None)
+    return int(status) if status else None
+
+
+def _is_connect_error(exc: Exception) -> bool:
+    """Failed before the request reached the server (requests or httpx)."""
+    return isinstance(exc, requests.exceptions.ConnectTimeout) or type(exc).__name__ in ("ConnectTimeout", "ConnectError")
+
+
+def _is_transport_error(exc: Exception) -> bool:
+    return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)) or any(
+        word in type(exc).__name__ for word in ("Timeout", "Connect", "RemoteProtocol")
+    )
+
+
+@shared_resource
+def http_session(base_url: str, pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """Keep-alive session shared by every HTTP call against one Label Studio server."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    return session
+
+
+def http_request(
+    base_url: str,
+    method: str,
+    path: str,
+    pool_size: int = HTTP_POOL_SIZE,
+    timeout=None,
+    retry: Optional[RetryPolicy] = None,
+    idempotent: Optional[bool] = None,
+    **kwargs,
+) -> requests.Response:
+    """Send one request through the pooled session for `base_url`.
+    `path` is either an API path ("/api/projects/") or an absolute URL.
+
+    Transient failures are retried per `retry` (DEFAULT_RETRY). Idempotent
+    requests (by method unless `idempotent` says otherwise) retry on timeouts,
+    dropped connections and the policy's statuses; others only when the server
+    cannot have acted on them: connect failures and REJECTED_STATUSES.
+    """
+    base_url = base_url.rstrip('/')
+    url = path if path.startswith(("http://", "https://")) else f"{base_url}{path}"
+    session = http_session(base_url, pool_size)
+    retry = retry or DEFAULT_RETRY
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+    governor = rate_governor(base_url)
+    for attempt in range(1, retry.attempts + 1):
+        try:
+            # Streamed bodies are read after the slot is released; the cap counts requests, not downloads
+            with governor.slot():
+                response = session.request(method, url, timeout=timeout or HTTP_TIMEOUT, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == retry.attempts or not (idempotent or _is_connect_error(e)):
+                raise
+            time.sleep(retry.delay(attempt))
+            continue
+        status = response.status_code
+        if (
+            attempt < retry.attempts
+            and status in retry.statuses
+            and (idempotent or status in REJECTED_STATUSES)
+        ):
+            delay = retry.delay(attempt, response.headers.get("Retry-After"))
+            response.close()
+            time.sleep(delay)
+            continue
+        return response
+
+
+def with_retry(client, fn: Callable, *args, idempotent: bool = True, governed: bool = True, **kwargs):
+    """Call an SDK method under the client's retry policy, same rules as http_request.
+    Pass `governed=False` for callables that go through http_request, which
+    takes its own governor slot (holding two would deadlock at low caps).
+    """
+    policy = getattr(client, 'retry_policy', DEFAULT_RETRY)
+    governor = rate_governor(getattr(client, 'url', getattr(client, 'base_url', '')).rstrip('/'))
+    for attempt in range(1, policy.attempts + 1):
+        try:
+            if not governed:
+                return fn(*args, **kwargs)
+            with governor.slot():
+                return fn(*args, **kwargs)
+        except Exception as e:
+            status = _error_status(e)
+            if status is not None:
+                transient = status in policy.statuses and (idempotent or status in REJECTED_STATUSES)
+            else:
+                transient = _is_connect_error(e) or (idempotent and _is_transport_error(e))
+            if not transient or attempt == policy.attempts:
+                raise
+            headers = getattr(getattr(e, "response", None), "headers", None) or getattr(e, "headers", None) or {}
+            time.sleep(policy.delay(attempt, headers.get("Retry-After")))
+
+
+def ls_request(client, method: str, path: str, auth: bool = True, **kwargs) -> requests.Response:
+    """HTTP fallback for SDK calls: pooled request against the client's server.
+    With `auth`, the Authorization header negotiated for this client is attached;
+    a 401 (token revoked or expired early) triggers one renegotiation and resend.
+    """
+    base_url = getattr(client, 'url', getattr(client, 'base_url', ''))
+    pool_size = getattr(client, 'http_pool_size', HTTP_POOL_SIZE)
+    kwargs.setdefault("retry", getattr(client, 'retry_policy', DEFAULT_RETRY))
+    if not auth:
+        return http_request(base_url, method, path, pool_size=pool_size, **kwargs)
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    headers.update(ls_auth_headers(client))
+    response = http_request(base_url, method, path, pool_size=pool_size, headers=headers, **kwargs)
+    if response.status_code == 401:
+        headers.update(ls_auth_headers(client, refresh=True))
+        response = http_request(base_url, method, path, pool_size=pool_size, headers=headers, **kwargs)
+    return response
+
+
+# =========================
+# SDK helpers
+# =========================
+def _client_key(base_url: str, api_key: str, pool_size: int = HTTP_POOL_SIZE) -> Tuple[str, str, int]:
+    # The token itself is never kept in the key
+    return base_url.rstrip('/'), hashlib.sha256(api_key.encode("utf-8")).hexdigest(), int(pool_size)
+
+
+@shared_resource(key=_client_key)
+def connect_ls(base_url: str, api_key: str, pool_size: int = HTTP_POOL_SIZE):
+    """SDK client for a server and token, built once per process and shared by
+    every session, so its connection pool is reused across reruns."""
+    if ClientType is None:
+        raise RuntimeError(
+            "label-studio-sdk not found or incompatible. Please `pip install label-studio-sdk`."
+        )
+    
+    # Clean up the base URL
+    base_url = base_url.rstrip('/')
+    
+    try:
+        # Try the official SDK method from documentation first
+        # Personal Access Tokens work automatically with SDK
+        try:
+            from label_studio_sdk.client import LabelStudio
+            client = LabelStudio(base_url=base_url, api_key=api_key)
+        except ImportError:
+            # Fallback to the dynamically imported ClientType
+            client = ClientType(base_url=base_url, api_key=api_key)
+        except TypeError:
+            # Try different parameter combinations for older SDK versions
+            try:
+                client = ClientType(url=base_url, api_key=api_key)
+            except TypeError:
+                # Some versions use 'token' instead of 'api_key'
+                client = ClientType(url=base_url, token=api_key)
+        
+        # Store connection details for fallback
+        client.url = base_url
+        client.api_key = api_key
+        client.http_pool_size = pool_size
+        return client
+        
+    except Exception as e:
+        raise RuntimeError(f"Failed to create Label Studio client: {e}")
+
+
+class ClientView:
+    """One caller's handle on a shared client (see connect_ls). Per-session
+    settings (`retry_policy`) live on the view, so sessions never change each
+    other's; every other attribute is read from and written to the shared client.
+    """
+
+    _LOCAL = frozenset({"retry_policy"})
+
+    def __init__(self, client, retry_policy: Optional[RetryPolicy] = None):
+        object.__setattr__(self, "_client", client)
+        object.__setattr__(self, "retry_policy", retry_policy or DEFAULT_RETRY)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in self._LOCAL:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._client, name, value)
+
+
+def get_access_token_from_pat(base_url: str, pat_token: str) -> str:
+    """Convert Personal Access Token to short-lived access token for HTTP API"""
+    try:
+        response = http_request(
+            base_url,
+            "POST",
+            "/api/token/refresh",
+            headers={"Content-Type": "application/json"},
+            json={"refresh": pat_token},
+            timeout=10
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            return data.get("access", "")
+        else:
+            report().warning(f"Token refresh failed: {response.status_code} - {response.text}")
+            return ""
+            
+    except Exception as e:
+        report().warning(f"Failed to refresh PAT token: {e}")
+        return ""
+
+
+# =========================
+# Auth negotiation
+# =========================
+ACCESS_TOKEN_TTL = 240  # seconds, used when the access token carries no `exp`
+ACCESS_TOKEN_REFRESH_MARGIN = 30  # refresh this many seconds before expiry
+
+
+def _auth_key(base_url: str, api_key: str) -> Tuple[str, str]:
+    return _client_key(base_url, api_key)[:2]
+
+
+@shared_resource(key=_auth_key)
+def _auth_lock(base_url: str, api_key: str) -> threading.Lock:
+    """Serializes token negotiation per server and token; a slow or failing
+    server never holds up auth for other servers or tokens."""
+    return threading.Lock()
+
+
+def _jwt_expiry(token: str) -> Optional[float]:
+    """Read the `exp` claim of a JWT without verifying it (we only need the deadline)."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return None
+
+
+def _negotiate_auth(client) -> Dict[str, Any]:
+    """Find the Authorization header this server accepts for the client's token.
+    Personal Access Tokens are exchanged for a short-lived access token; otherwise
+    Bearer (LS 1.20+) and legacy Token are probed once with a one-item request.
+    """
+    base_url = getattr(client, 'url', getattr(client, 'base_url', ''))
+    api_key = getattr(client, 'api_key', '')
+    if not base_url or not api_key:
+        raise RuntimeError("Missing base_url or api_key from client")
+
+    access_token = get_access_token_from_pat(base_url, api_key)
+    if access_token:
+        expires_at = _jwt_expiry(access_token) or time.time() + ACCESS_TOKEN_TTL
+        return {"scheme": "Bearer (from PAT)", "header": f"Bearer {access_token}", "expires_at": expires_at}
+
+    for auth_type in ["Bearer", "Token"]:
+        response = ls_request(
+            client,
+            "GET",
+            "/api/projects/",
+            auth=False,
+            headers={"Authorization": f"{auth_type} {api_key}"},
+            params={"page": 1, "page_size": 1},
+        )
+        if response.status_code != 401:
+            return {"scheme": auth_type, "header": f"{auth_type} {api_key}", "expires_at": None}
+    raise RuntimeError("Authentication failed with both Bearer and Token formats")
+
+
+def ls_auth_headers(client, refresh: bool = False) -> Dict[str, str]:
+    """Authorization header for `client`, negotiated once and cached on the client.
+    Access tokens obtained from a PAT are refreshed shortly before they expire.
+    """
+    base_url = getattr(client, 'url', getattr(client, 'base_url', ''))
+    with _auth_lock(base_url, str(getattr(client, 'api_key', '') or '')):
+        auth = getattr(client, '_ls_auth', None)
+        expired = (
+            auth is not None
+            and auth["expires_at"] is not None
+            and time.time() > auth["expires_at"] - ACCESS_TOKEN_REFRESH_MARGIN
+        )
+        if auth is None or refresh or expired:
+            auth = _negotiate_auth(client)
+            client._ls_auth = auth
+        return {"Authorization": auth["header"]}
+
+
+def test_connection(base_url: str, api_key: str) -> tuple[bool, str]:
+    """Test connection to Label Studio and return success status and message"""
+    try:
+        # Clean up URL
+        base_url = base_url.rstrip('/')
+        
+        # Test basic connectivity first
+        try:
+            response = http_request(base_url, "GET", "/health", timeout=10, retry=NO_RETRY)
+            if response.status_code == 200:
+                report().write("✅ Health check passed")
+            else:
+                # Try without /health endpoint
+                response = http_request(base_url, "GET", base_url, timeout=10, retry=NO_RETRY)
+                if response.status_code == 200:
+                    report().write("✅ Base URL accessible")
+        except Exception as e:
+            return False, f"Cannot connect to {base_url}. Is Label Studio running on port 8082? Error: {e}"
+        
+        # Test authentication with debugging
+        endpoints = ["/api/projects/", "/api/projects"]
+        auth_formats = [
+            ("Bearer", f"Bearer {api_key}"),
+            ("Token", f"Token {api_key}")
+        ]
+        
+        for endpoint in endpoints:
+            report().write(f"Testing endpoint: {endpoint}")
+            for auth_name, auth_header in auth_formats:
+                try:
+                    headers = {
+                        "Authorization": auth_header,
+                        "Content-Type": "application/json"
+                    }
+                    params = {"page": 1, "page_size": 10}  # Small request
+                    
+                    report().write(f"  Trying {auth_name} authentication...")
+                    response = http_request(base_url, "GET", endpoint, headers=headers, params=params, timeout=10, retry=NO_RETRY)
+                    
+                    report().write(f"    Response: {response.status_code}")
+                    
+                    if response.status_code == 200:
+                        data = response.json()
+                        project_count = len(data) if isinstance(data, list) else len(data.get('results', []))
+                        return True, f"✅ Connected successfully! Found {project_count} projects using {auth_name} auth on {endpoint}"
+                    elif response.status_code == 401:
+                        report().write(f"    ❌ 401 Unauthorized with {auth_name}")
+                    elif response.status_code == 403:
+                        report().write(f"    ❌ 403 Forbidden")
+                    else:
+                        report().write(f"    ❌ {response.status_code}: {response.text[:100]}")
+                        
+                except Exception as e:
+                    report().write(f"    ❌ Error: {e}")
+                    continue
+        
+        return False, "❌ Authentication failed with all methods. Please check your API token."
+        
+    except Exception as e:
+        return False, f"❌ Connection test failed: {str(e)}"
+
+
+def _obj_to_dict(x: Any) -> Dict[str, Any]:
+    if x is None:
+        return {}
+    if isinstance(x, dict):
+        return x
+    for key in ("to_dict", "dict"):
+        if hasattr(x, key) and callable(getattr(x, key)):
+            try:
+                return getattr(x, key)()
+            except Exception:
+                pass
+    try:
+        return {k: getattr(x, k) for k in dir(x) if not k.startswith("_")}
+    except Exception:
+        return {"value": str(x)}
+
+
+def _safe_attr(x: Any, name: str, default=None):
+    try:
+        return getattr(x, name)
+    except Exception:
+        try:
+            d = _obj_to_dict(x)
+            return d.get(name, default)
+        except Exception:
+            return default
+
+
+# =========================
+# Project metadata cache
+# =========================
+METADATA_TTL = 300  # seconds
+METADATA_MAX_ENTRIES = 1024
+MetadataKey = Tuple[str, str, Optional[int], str]  # (server, kind, project id, token hash)
+
+
+class MetadataCache:
+    """TTL + LRU cache for project metadata (project list, project objects,
+    summaries), keyed by (server, kind, project id, token hash) so users who
+    share a server never see each other's results. Entries expire after
+    `ttl` seconds; beyond `max_entries` the least recently used are dropped.
+    Writers call invalidate() so the next read goes to the server.
+    """
+
+    def __init__(self, ttl: float = METADATA_TTL, max_entries: int = METADATA_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[MetadataKey, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: MetadataKey) -> Tuple[bool, Any]:
+        """(hit, value) for an entry that has not expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def put(self, key: MetadataKey, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, server: str, project_id: Optional[int] = None) -> None:
+        """Drop a server's project list and, with `project_id`, that project's
+        entries; without it, everything cached for the server (for every token)."""
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == server and (project_id is None or key[2] is None or key[2] == int(project_id)):
+                    del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+@shared_resource
+def metadata_cache() -> MetadataCache:
+    """The process-wide project metadata cache."""
+    return MetadataCache()
+
+
+def _server_key(client) -> str:
+    return getattr(client, 'url', getattr(client, 'base_url', '')).rstrip('/')
+
+
+def _metadata_key(client, kind: str, project_id: Optional[int]) -> MetadataKey:
+    # What a project list or project returns depends on whose token asked
+    token = _client_key(_server_key(client), str(getattr(client, 'api_key', '') or ''))[1]
+    return _server_key(client), kind, None if project_id is None else int(project_id), token
+
+
+def _cached(client, kind: str, project_id: Optional[int], fetch: Callable[[], Any], refresh: bool = False) -> Any:
+    """`fetch()` through the metadata cache; `refresh` skips the lookup but stores the result."""
+    key = _metadata_key(client, kind, project_id)
+    cache = metadata_cache()
+    if not refresh:
+        hit, value = cache.get(key)
+        if hit:
+            return value
+    value = fetch()
+    cache.put(key, value)
+    return value
+
+
+def invalidate_project(client, project_id: Optional[int] = None) -> None:
+    """Forget cached metadata after a write (project created, tasks imported)."""
+    metadata_cache().invalidate(_server_key(client), project_id)
+
+
+def list_projects(client, refresh: bool = False) -> List[Any]:
+    """All projects of the server (cached, see MetadataCache)."""
+    return _cached(client, "projects", None, lambda: _list_projects(client), refresh)
+
+
+def _list_projects(client) -> List[Any]:
+    try:
+        # Priority 1: Try SDK methods (these handle PAT tokens automatically)
+        if hasattr(client, 'get_projects'):
+            try:
+                projects = with_retry(client, client.get_projects)
+                report().success("✅ SDK get_projects() worked!")
+                return list(projects) if projects else []
+            except Exception as sdk_error:
+                report().warning(f"SDK get_projects failed: {sdk_error}, trying alternatives...")
+        
+        if hasattr(client, 'projects') and hasattr(client.projects, 'list'):
+            try:
+                projects = with_retry(client, lambda: list(client.projects.list(page_size=100)))
+                report().success("✅ SDK projects.list() worked!")
+                return projects
+            except Exception as sdk_error:
+                report().warning(f"SDK projects.list failed: {sdk_error}, trying alternatives...")
+        
+        if hasattr(client, 'list_projects'):
+            try:
+                projects = with_retry(client, lambda: list(client.list_projects()))
+                report().success("✅ SDK list_projects() worked!")
+                return projects
+            except Exception as sdk_error:
+                report().warning(f"SDK list_projects failed: {sdk_error}, trying HTTP API...")
+        
+        # Priority 2: Direct HTTP API calls with PAT token handling
+        report().info("Trying direct HTTP API calls with PAT token handling...")
+        
+        base_url = getattr(client, 'url', getattr(client, 'base_url', ''))
+        
+        # Auth scheme (and PAT access token) is negotiated once per client
+        endpoints = ["/api/projects/", "/api/projects"]
+        last_error = None
+        for endpoint in endpoints:
+            try:
+                headers = {"Content-Type": "application/json"}
+                # Use simple pagination instead of large page_size
+                params = {"page": 1, "page_size": 50}
+                
+                response = ls_request(client, "GET", endpoint, headers=headers, params=params, timeout=30)
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    report().success(f"✅ Success with {client._ls_auth['scheme']} auth!")
+                    
+                    # Handle both list and paginated responses
+                    if isinstance(data, list):
+                        return data
+                    elif isinstance(data, dict) and 'results' in data:
+                        # Get all pages if paginated
+                        all_projects = data['results']
+                        page = 2
+                        while data.get('next'):
+                            params['page'] = page
+                            response = ls_request(client, "GET", endpoint, headers=headers, params=params, timeout=30)
+                            if response.status_code == 200:
+                                data = response.json()
+                                all_projects.extend(data.get('results', []))
+                                page += 1
+                            else:
+                                break
+                        return all_projects
+                    else:
+                        return data if isinstance(data, list) else [data]
+                        
+                elif response.status_code == 401:
+                    last_error = f"401 Unauthorized with {client._ls_auth['scheme']} auth on {endpoint}"
+                    report().error(f"❌ {last_error}")
+                    break
+                elif response.status_code == 403:
+                    last_error = f"403 Forbidden - insufficient permissions"
+                    report().error(f"❌ {last_error}")
+                    break
+                elif response.status_code == 404:
+                    last_error = f"404 Not Found - endpoint {endpoint} does not exist"
+                    report().warning(f"⚠️ {last_error}")
+                    continue
+                else:
+                    last_error = f"{response.status_code}: {response.text[:200]}"
+                    report().error(f"❌ {last_error}")
+                    continue
+                    
+            except requests.exceptions.ConnectionError:
+                last_error = f"Connection failed to {base_url} - is Label Studio running on port 8082?"
+                report().error(f"❌ {last_error}")
+            except requests.exceptions.Timeout:
+                last_error = f"Request timeout to {base_url}"
+                report().error(f"❌ {last_error}")
+            except Exception as e:
+                last_error = f"Request error: {str(e)}"
+                report().error(f"❌ {last_error}")
+        
+        # If we get here, all attempts failed
+        raise RuntimeError(f"All authentication attempts failed. Last error: {last_error}")
+            
+    except Exception as e:
+        if "401" in str(e) or "Unauthorized" in str(e):
+            raise RuntimeError(
+                f"Authentication failed (401 Unauthorized). Please check:\n"
+                f"1. Your API token is correct and not expired\n"
+                f"2. Generate a new token in Label Studio: Account & Settings → Access Token\n"
+                f"3. Make sure Label Studio is running and accessible\n"
+                f"4. For Personal Access Tokens, the SDK should handle token refresh automatically\n"
+                f"Original error: {e}"
+            )
+        else:
+            raise RuntimeError(f"Could not list projects: {e}")
+
+
+def get_project(client, pid: int, refresh: bool = False):
+    """Project object by id (cached, see MetadataCache)."""
+    return _cached(client, "project", pid, lambda: _get_project(client, pid), refresh)
+
+
+def _get_project(client, pid: int):
+    try:
+        # Try modern SDK first
+        if hasattr(client, 'projects') and hasattr(client.projects, 'get'):
+            return with_retry(client, client.projects.get, id=pid)
+        elif hasattr(client, 'get_project'):
+            return with_retry(client, client.get_project, pid)
+        else:
+            # Fallback to direct API call (auth negotiated once per client)
+            response = ls_request(client, "GET", f"/api/projects/{pid}/")
+            response.raise_for_status()
+            return response.json()
+    except Exception:
+        # Fallback: search in projects list
+        projs = list_projects(client)
+        for p in projs:
+            if int(_safe_attr(p, "id")) == int(pid):
+                return p
+        raise RuntimeError(f"Project {pid} not found")
+
+
+def label_config_of(project) -> str:
+    return _safe_attr(project, "label_config", "")
+
+
+# =========================
+# Exporters (stream + snapshot)
+# =========================
+
+def _prefetch_pages(fetch_page: Callable[[int], Any], pages: Iterable[int], window: int):
+    """Fetch pages concurrently through a sliding window of `window` requests,
+    yielding results strictly in page order (at most `window` pages held at once).
+    """
+    pages = iter(pages)
+    with ThreadPoolExecutor(max_workers=window) as pool:
+        inflight = deque(pool.submit(fetch_page, page) for page in itertools.islice(pages, window))
+        try:
+            while inflight:
+                result = inflight.popleft().result()
+                for page in itertools.islice(pages, 1):
+                    inflight.append(pool.submit(fetch_page, page))
+                yield result
+        finally:
+            for fut in inflight:
+                fut.cancel()
+
+
+def _legacy_tasks_api(client) -> bool:
+    """Only the old SDK's get_project_tasks is available (no server-side filters)."""
+    return not (hasattr(client, 'tasks') and hasattr(client.tasks, 'list')) and hasattr(client, 'get_project_tasks')
+
+
+def _page_tasks(data: Any) -> Optional[List[Any]]:
+    """Tasks of one list page: "results" (project tasks API) or "tasks" (Data Manager API)."""
+    if not isinstance(data, dict):
+        return None
+    return data.get('results', data.get('tasks'))
+
+
+def _sdk_pager_items(client, pager) -> Iterable[Any]:
+    """Items of an SDK pager, fetching each further page under the client's
+    retry policy and rate governor (iterating the pager directly would not).
+
+    SDK 1.x pagers report has_next while the last page was non-empty, so the
+    request past the end answers 404; like SyncPagerExt, that ends the pages.
+    """
+    page = pager
+    if not hasattr(page, "has_next") or not hasattr(page, "items"):
+        yield from page
+        return
+    while page is not None and page.items:
+        yield from page.items
+        fetch_next = getattr(page, "get_next", None) or getattr(page, "next_page", None)
+        if not page.has_next or not callable(fetch_next):
+            return
+        try:
+            page = with_retry(client, fetch_next)
+        except Exception as e:
+            if _error_status(e) == 404:
+                return
+            raise
+
+
+def tasks_iter(
+    client,
+    project_id: int,
+    fields: str = "all",
+    page_size: int = 1000,
+    prefetch: int = 0,
+    query: Optional[str] = None,
+    include: Optional[str] = None,
+):
+    """Yield tasks of a project. In the HTTP fallback, `prefetch` > 1 reads the total
+    from the first page and fetches the remaining pages `prefetch` at a time.
+    `query` is a Data Manager query (JSON filters) evaluated by the server;
+    `include` is a comma-separated list of task fields to return (see task_projection).
+    """
+    try:
+        # Try modern SDK first
+        if hasattr(client, 'tasks') and hasattr(client.tasks, 'list'):
+            extra = {k: v for k, v in (("query", query), ("include", include)) if v is not None}
+            try:
+                pager = with_retry(client, client.tasks.list, project=project_id, fields=fields, page_size=page_size, **extra)
+            except TypeError:
+                # Older SDKs without `include`: full task objects, same result
+                extra.pop("include", None)
+                pager = with_retry(client, client.tasks.list, project=project_id, fields=fields, page_size=page_size, **extra)
+            for t in _sdk_pager_items(client, pager):
+                yield t
+        elif hasattr(client, 'get_project_tasks'):
+            if query is not None:
+                raise RuntimeError("this SDK version cannot filter task lists")
+            tasks = with_retry(client, client.get_project_tasks, project_id)
+            for t in tasks:
+                yield t
+        else:
+            # Fallback to direct API call (auth negotiated once per client)
+            if query is None and include is None:
+                path, params = f"/api/projects/{project_id}/tasks/", {}
+            else:
+                # Filtered and projected lists go through the Data Manager endpoint
+                path, params = "/api/tasks/", {"project": project_id, "fields": fields}
+                params.update({k: v for k, v in (("query", query), ("include", include)) if v is not None})
+
+            def fetch_page(page: int):
+                response = ls_request(
+                    client,
+                    "GET",
+                    path,
+                    params={**params, "page": page, "page_size": page_size}
+                )
+                response.raise_for_status()
+                return response.json()
+            
+            page = 1
+            seen = 0
+            while True:
+                data = fetch_page(page)
+                
+                total = data.get('count', data.get('total')) if isinstance(data, dict) else None
+                if page == 1 and prefetch > 1 and total is not None and _page_tasks(data):
+                    first = _page_tasks(data)
+                    for t in first:
+                        yield t
+                    seen = len(first)
+                    # Page count from what the server returned: it may cap page_size (TASK_API_PAGE_SIZE_MAX)
+                    last_page = -(-int(total) // len(first))
+                    for page_data in _prefetch_pages(fetch_page, range(2, last_page + 1), prefetch):
+                        for t in _page_tasks(page_data) or []:
+                            yield t
+                            seen += 1
+                    if seen != int(total):
+                        raise RuntimeError(f"got {seen} of {total} tasks (project changed during export?)")
+                    break
+                
+                tasks = _page_tasks(data)
+                if tasks is not None:
+                    if not tasks:
+                        break
+                    for t in tasks:
+                        yield t
+                    seen += len(tasks)
+                    # The Data Manager API has no "next" link; page until the total is reached
+                    more = data.get('next') if 'next' in data else total is not None and seen < int(total)
+                    if not more:
+                        if total is not None and seen != int(total):
+                            raise RuntimeError(f"got {seen} of {total} tasks (project changed during export?)")
+                        break
+                    page += 1
+                elif isinstance(data, list):
+                    for t in data:
+                        yield t
+                    break
+                else:
+                    break
+    except Exception as e:
+        # Never end the iteration quietly: a partial task list would be merged as if complete
+        raise RuntimeError(f"Could not iterate tasks for project {project_id}: {e}")
+
+
+@shared_resource
+def task_cache(path: str = str(TASK_CACHE)) -> TaskCache:
+    """The on-disk task cache (one SQLite connection per file per process)."""
+    return TaskCache(path)
+
+
+def build_export_stream(
+    client,
+    project_id: int,
+    include_annotations: bool = True,
+    include_predictions: bool = False,
+    on_progress: Optional[Callable[[int], None]] = None,
+    prefetch: int = 0,
+    cache: Optional[TaskCache] = None,
+) -> List[Dict[str, Any]]:
+    """Page through tasks and keep only data + annotation/prediction results.
+    `on_progress(n)` is called with the running task count after every 1000 tasks.
+    With `cache`, only tasks updated since the last export are downloaded.
+    """
+    return list(
+        iter_export_stream(
+            client,
+            project_id,
+            include_annotations=include_annotations,
+            include_predictions=include_predictions,
+            on_progress=on_progress,
+            prefetch=prefetch,
+            cache=cache,
+        )
+    )
+
+
+def _export_task(t: Any, include_annotations: bool, include_predictions: bool) -> Dict[str, Any]:
+    """Reduce an SDK or API task to data + annotation/prediction results."""
+    item: Dict[str, Any] = {"data": dict(_safe_attr(t, "data", {}) or {})}
+    if include_annotations:
+        anns = []
+        for a in (_safe_attr(t, "annotations", []) or []):
+            anns.append({"result": _safe_attr(a, "result", [])})
+        if anns:
+            item["annotations"] = anns
+    if include_predictions:
+        preds = []
+        for p in (_safe_attr(t, "predictions", []) or []):
+            preds.append({"result": _safe_attr(p, "result", [])})
+        if preds:
+            item["predictions"] = preds
+    return item
+
+
+def _task_version(t: Any) -> Tuple[Optional[int], Optional[str]]:
+    """(id, updated_at as ISO text) of an SDK or API task."""
+    tid = _safe_attr(t, "id")
+    updated = _safe_attr(t, "updated_at")
+    if hasattr(updated, "isoformat"):
+        updated = updated.isoformat()
+    return (int(tid) if tid is not None else None), (str(updated) if updated else None)
+
+
+def _updated_since_query(watermark: str) -> str:
+    return json.dumps({
+        "filters": {
+            "conjunction": "and",
+            "items": [{
+                "filter": "filter:tasks:updated_at",
+                "operator": "greater_or_equal",
+                "type": "Datetime",
+                "value": watermark,
+            }],
+        }
+    })
+
+
+TASK_CACHE_BATCH = 5000
+
+
+def _delta_sync(client, server: str, project_id: int, state: Dict[str, Any], prefetch: int, cache: TaskCache) -> bool:
+    """Upsert tasks updated since the last sync; True if the cache now matches the project."""
+    watermark = state["watermark"]
+    rows = []
+    query = _updated_since_query(watermark)
+    fields, include = task_projection(state["annotations"], state["predictions"])
+    for t in tasks_iter(client, project_id, fields, page_size=1000, prefetch=prefetch, query=query, include=include):
+        tid, updated = _task_version(t)
+        if tid is None:
+            continue
+        rows.append((tid, updated, _export_task(t, state["annotations"], state["predictions"])))
+        if updated and updated > watermark:
+            watermark = updated
+        if len(rows) >= TASK_CACHE_BATCH:
+            cache.upsert(server, project_id, rows)
+            rows = []
+    cache.upsert(server, project_id, rows)
+    expected = _safe_attr(get_project(client, project_id, refresh=True), "task_number")
+    if expected is not None and cache.count(server, project_id) != int(expected):
+        report().info(f"Project {project_id}: task count changed since the last export, re-exporting in full")
+        return False
+    cache.finish(server, project_id, watermark, state["annotations"], state["predictions"])
+    return True
+
+
+def _iter_cached_export(
+    client,
+    project_id: int,
+    include_annotations: bool,
+    include_predictions: bool,
+    prefetch: int,
+    cache: TaskCache,
+) -> Iterable[Dict[str, Any]]:
+    """Delta sync of one project into `cache`, then its tasks from the cache.
+    Falls back to a full export (refilling the cache) on the first run, when
+    the cache lacks annotations/predictions now asked for, when the cached
+    task count no longer matches the project (tasks were deleted), or when
+    the server rejects the delta query.
+    """
+    server = getattr(client, 'url', getattr(client, 'base_url', '')).rstrip('/')
+    state = cache.sync_state(server, project_id)
+    if (
+        state is not None
+        and (state["annotations"] or not include_annotations)
+        and (state["predictions"] or not include_predictions)
+    ):
+        try:
+            synced = _delta_sync(client, server, project_id, state, prefetch, cache)
+        except Exception as e:
+            # e.g. an older Data Manager without the updated_at filter; nothing was yielded yet
+            report().warning(f"Project {project_id}: incremental export failed ({e}), re-exporting in full")
+            synced = False
+        if synced:
+            yield from cache.iter_items(server, project_id, include_annotations, include_predictions)
+            return
+
+    # Full export, written through to the cache; the sync is only recorded once it completes
+    cache.begin_full(server, project_id)
+    watermark = ""
+    cacheable = True
+    rows = []
+    fields, include = task_projection(include_annotations, include_predictions)
+    for t in tasks_iter(client, project_id, fields, page_size=1000, prefetch=prefetch, include=include):
+        item = _export_task(t, include_annotations, include_predictions)
+        tid, updated = _task_version(t)
+        if tid is None or not updated:
+            cacheable = False
+        elif cacheable:
+            rows.append((tid, updated, item))
+            watermark = max(watermark, updated)
+            if len(rows) >= TASK_CACHE_BATCH:
+                cache.upsert(server, project_id, rows)
+                rows = []
+        yield item
+    if cacheable and watermark:
+        cache.upsert(server, project_id, rows)
+        cache.finish(server, project_id, watermark, include_annotations, include_predictions)
+
+
+def iter_export_stream(
+    client,
+    project_id: int,
+    include_annotations: bool = True,
+    include_predictions: bool = False,
+    on_progress: Optional[Callable[[int], None]] = None,
+    prefetch: int = 0,
+    cache: Optional[TaskCache] = None,
+) -> Iterable[Dict[str, Any]]:
+    """Generator form of build_export_stream: one reduced task at a time."""
+    if cache is not None and not _legacy_tasks_api(client):
+        items = _iter_cached_export(client, project_id, include_annotations, include_predictions, prefetch, cache)
+    else:
+        # Only the parts the export keeps are requested from the server
+        fields, include = task_projection(include_annotations, include_predictions)
+        items = (
+            _export_task(t, include_annotations, include_predictions)
+            for t in tasks_iter(client, project_id, fields, page_size=1000, prefetch=prefetch, include=include)
+        )
+    count = 0
+    for item in items:
+        yield item
+        count += 1
+        if on_progress is not None and count % 1000 == 0:
+            on_progress(count)
+
+
+def build_export_snapshot(client, project_id: int, poll_seconds: int = 2, timeout: int = 1800) -> List[Dict[str, Any]]:
+    """Create a server-side export snapshot, download ZIP, and extract tasks JSON.
+    Returns a list[task]. Assumes default LS export format.
+    """
+    return list(iter_export_snapshot(client, project_id, poll_seconds=poll_seconds, timeout=timeout))
+
+
+def iter_export_snapshot(client, project_id: int, poll_seconds: int = 2, timeout: int = 1800) -> Iterable[Dict[str, Any]]:
+    """Generator form of build_export_snapshot: tasks are parsed incrementally
+    from the downloaded ZIP and yielded one at a time.
+    """
+    # Create export
+    try:
+        # Try different SDK methods
+        if hasattr(client, 'projects') and hasattr(client.projects, 'exports'):
+            snap = with_retry(client, client.projects.exports.create, id=project_id, title=f"snapshot-{project_id}")
+        elif hasattr(client, 'make_request'):
+            # Direct API call through SDK
+            snap = with_retry(client, client.make_request, 'POST', f'/api/projects/{project_id}/exports/', json={'title': f"snapshot-{project_id}"})
+        else:
+            # Fallback to requests (a duplicate snapshot is harmless, so retry freely)
+            response = ls_request(
+                client,
+                "POST",
+                f"/api/projects/{project_id}/exports/",
+                json={'title': f"snapshot-{project_id}"},
+                idempotent=True,
+            )
+            response.raise_for_status()
+            snap = response.json()
+    except Exception as e:
+        # Fallback to stream export if snapshot fails
+        report().warning(f"Snapshot export failed for project {project_id}, falling back to stream export: {e}")
+        yield from iter_export_stream(client, project_id, include_annotations=True, include_predictions=False)
+        return
+
+    snap_id = _safe_attr(snap, "id")
+    status = _safe_attr(snap, "status", "")
+
+    # Poll
+    start = time.time()
+    while status not in ("completed", "failed", "error"):
+        time.sleep(poll_seconds)
+        # refresh snapshot status
+        try:
+            if hasattr(client, 'projects') and hasattr(client.projects, 'exports'):
+                snap = with_retry(client, client.projects.exports.get, id=project_id, export_pk=snap_id)
+            else:
+                # Fallback API call
+                response = ls_request(client, "GET", f"/api/projects/{project_id}/exports/{snap_id}/")
+                response.raise_for_status()
+                snap = response.json()
+            status = _safe_attr(snap, "status", "")
+        except Exception:
+            # Some SDKs don't expose .get(); try listing and filtering
+            try:
+                if hasattr(client, 'projects') and hasattr(client.projects, 'exports'):
+                    exps = with_retry(client, client.projects.exports.list, id=project_id)
+                else:
+                    response = ls_request(client, "GET", f"/api/projects/{project_id}/exports/")
+                    response.raise_for_status()
+                    exps = response.json()
+                
+                for e in exps:
+                    if _safe_attr(e, "id") == snap_id:
+                        status = _safe_attr(e, "status", "")
+                        break
+            except Exception:
+                break
+                
+        if time.time() - start > timeout:
+            raise TimeoutError(f"Snapshot export timed out for project {project_id}")
+
+    if status != "completed":
+        raise RuntimeError(f"Snapshot export ended with status '{status}' for project {project_id}")
+
+    # Stream the ZIP to a temp file, then parse tasks out of it one at a time
+    fd, tmp = tempfile.mkstemp(prefix=f"snapshot_{project_id}_{snap_id}_", suffix=".zip")
+    os.close(fd)
+    try:
+        download_snapshot(client, project_id, snap_id, tmp)
+        yield from iter_snapshot_tasks(tmp)
+    finally:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+DOWNLOAD_CHUNK = 1 << 20
+
+
+def download_snapshot(client, project_id: int, snap_id: int, dest: str) -> None:
+    """Write a finished snapshot ZIP to `dest` without buffering it in memory."""
+    if hasattr(client, 'projects') and hasattr(client.projects, 'exports'):
+        # The SDK yields the ZIP as byte chunks; a dropped stream restarts the file
+        def sdk_download() -> None:
+            with open(dest, "wb") as f:
+                for chunk in client.projects.exports.download(
+                    id=project_id, export_pk=snap_id, request_options={"chunk_size": DOWNLOAD_CHUNK}
+                ):
+                    f.write(chunk)
+        with_retry(client, sdk_download)
+        return
+
+    # Fallback download, streamed in chunks; a dropped stream restarts the file
+    def http_download() -> None:
+        response = ls_request(
+            client, "GET", f"/api/projects/{project_id}/exports/{snap_id}/download/", stream=True, retry=NO_RETRY
+        )
+        with response:
+            response.raise_for_status()
+            with open(dest, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                    f.write(chunk)
+    with_retry(client, http_download, governed=False)
+
+
+EXPORT_WORKERS = 4
+
+
+def export_projects_parallel(
+    project_ids: List[int],
+    export_fn: Callable[[int, Callable[[int], None]], List[Dict[str, Any]]],
+    max_workers: int = EXPORT_WORKERS,
+    on_update: Optional[Callable[[Dict[int, Dict[str, Any]]], None]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """Run `export_fn(pid, on_progress)` for several projects on a bounded thread pool.
+    `on_update(state)` is called from the calling thread with per-project
+    {"status", "tasks"} while exports run. Results come back in `project_ids` order
+    regardless of completion order, so the merge stays deterministic.
+    """
+    state: Dict[int, Dict[str, Any]] = {pid: {"status": "queued", "tasks": 0} for pid in project_ids}
+    bind_thread = report().thread_initializer()
+
+    def run(pid: int) -> List[Dict[str, Any]]:
+        bind_thread()
+        state[pid]["status"] = "exporting"
+
+        def on_progress(n: int) -> None:
+            state[pid]["tasks"] = n
+
+        data_list = export_fn(pid, on_progress)
+        state[pid].update(status="done", tasks=len(data_list))
+        return data_list
+
+    results: Dict[int, List[Dict[str, Any]]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(project_ids)))) as pool:
+        futures = {pool.submit(run, pid): pid for pid in project_ids}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in done:
+                pid = futures[fut]
+                try:
+                    results[pid] = fut.result()
+                except Exception as e:
+                    state[pid]["status"] = "failed"
+                    for other in pending:
+                        other.cancel()
+                    raise RuntimeError(f"Export failed for project {pid}: {e}")
+            if on_update is not None:
+                on_update(state)
+    return [results[pid] for pid in project_ids]
+
+
+def async_client(client) -> AsyncLabelStudio:
+    """Async engine bound to the same server, auth and pool size as `client`."""
+    return AsyncLabelStudio(
+        getattr(client, 'url', getattr(client, 'base_url', '')),
+        ls_auth_headers(client)["Authorization"],
+        refresh_auth=lambda: ls_auth_headers(client, refresh=True)["Authorization"],
+        pool_size=getattr(client, 'http_pool_size', HTTP_POOL_SIZE),
+        retry=getattr(client, 'retry_policy', DEFAULT_RETRY),
+        governor=rate_governor(getattr(client, 'url', getattr(client, 'base_url', '')).rstrip('/')),
+    )
+
+
+# =========================
+# Rewriters & merge
+# =========================
+
+def stable_key(task: Dict[str, Any], dedup_field: Optional[str]) -> str:
+    """Printable dedup key (dedup_field value or hex content digest); see ls_dedup.task_key."""
+    k = task_key(task, dedup_field)
+    return k.hex() if isinstance(k, bytes) else k
+
+
+def concat_and_dedup(
+    lists: List[List[Dict[str, Any]]],
+    dedup_field: Optional[str],
+    keys: Optional[List[List[Any]]] = None,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Merge `lists` in order, dropping repeated keys. `keys` are precomputed
+    task keys parallel to `lists` (see ls_parallel.rewrite_keyed_lists)."""
+    stats: Dict[str, int] = {}
+    estimated = sum(len(l) for l in lists)
+    tasks = itertools.chain.from_iterable(lists)
+    if keys is not None:
+        unique = dedup_keyed_iter(zip(itertools.chain.from_iterable(keys), tasks), stats, estimated_keys=estimated)
+    else:
+        unique = dedup_iter(tasks, dedup_field, stats, estimated_keys=estimated)
+    merged = list(unique)
+    return merged, stats["dropped"]
+
+
+def near_dedup(
+    client,
+    tasks: Iterable[Dict[str, Any]],
+    field: str,
+    distance: int = DEFAULT_DISTANCE,
+    workers: Optional[int] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> Iterable[Dict[str, Any]]:
+    """Drop tasks whose data[field] image is a perceptual near-duplicate of an earlier one.
+    Relative Label Studio URLs are fetched with the client's auth.
+    """
+    base_url = _server_key(client)
+    return near_dedup_iter(
+        tasks,
+        field,
+        base_url=base_url,
+        # Re-read per chunk: PAT access tokens expire during long merges
+        auth_headers=lambda: ls_auth_headers(client),
+        distance=distance,
+        workers=workers,
+        stats=stats,
+        retry=getattr(client, 'retry_policy', DEFAULT_RETRY),
+        governor=rate_governor(base_url),
+    )
+
+
+def create_project(client, title: str, label_config: str, description: str = "") -> int:
+    try:
+        # Try modern SDK first
+        if hasattr(client, 'projects') and hasattr(client.projects, 'create'):
+            p = with_retry(client, client.projects.create, title=title, label_config=label_config, description=description, idempotent=False)
+        elif hasattr(client, 'create_project'):
+            p = with_retry(client, client.create_project, title=title, label_config=label_config, description=description, idempotent=False)
+        else:
+            # Fallback to direct API call (auth negotiated once per client)
+            response = ls_request(
+                client,
+                "POST",
+                "/api/projects/",
+                json={
+                    'title': title,
+                    'label_config': label_config,
+                    'description': description
+                }
+            )
+            response.raise_for_status()
+            p = response.json()
+        
+        pid = int(_safe_attr(p, "id"))
+    except Exception as e:
+        raise RuntimeError(f"Failed to create project: {e}")
+    invalidate_project(client, pid)
+    return pid
+
+
+def _import_batch(client, project_id: int, payload: List[Dict[str, Any]], body: Optional[bytes] = None) -> float:
+    """POST one batch; `body` is the pre-serialized JSON array when available.
+    Returns the request latency in seconds.
+    """
+    started = time.monotonic()
+    # Try modern SDK first
+    if hasattr(client, 'projects') and hasattr(client.projects, 'import_tasks'):
+        with_retry(client, client.projects.import_tasks, id=project_id, request=payload, return_task_ids=False, idempotent=False)
+    elif hasattr(client, 'import_tasks'):
+        with_retry(client, client.import_tasks, project_id, payload, idempotent=False)
+    else:
+        # Fallback to direct API call (auth negotiated once per client)
+        if body is not None:
+            response = ls_request(
+                client,
+                "POST",
+                f"/api/projects/{project_id}/import",
+                data=body,
+                headers={"Content-Type": "application/json"},
+            )
+        else:
+            response = ls_request(client, "POST", f"/api/projects/{project_id}/import", json=payload)
+        response.raise_for_status()
+    return time.monotonic() - started
+
+
+class AdaptiveBatchSizer:
+    """Byte budget for import batches, adapted to how fast the server keeps up.
+    Grows by `grow` while responses come back under half the target latency,
+    halves on slow responses and on 413/504.
+    """
+
+    def __init__(
+        self,
+        budget: int = 4 << 20,
+        min_budget: int = 64 << 10,
+        max_budget: int = 64 << 20,
+        target_latency: float = 10.0,
+        grow: float = 1.5,
+    ):
+        self.budget = budget
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.target_latency = target_latency
+        self.grow = grow
+        self._lock = threading.Lock()
+
+    def observe(self, latency: float) -> None:
+        with self._lock:
+            if latency > self.target_latency:
+                self.budget = max(self.min_budget, self.budget // 2)
+            elif latency < self.target_latency / 2:
+                self.budget = min(self.max_budget, int(self.budget * self.grow))
+
+    def shrink(self) -> None:
+        with self._lock:
+            self.budget = max(self.min_budget, self.budget // 2)
+
+
+def _task_batches(it, batch: int, sizer: Optional[AdaptiveBatchSizer]):
+    """Yield (start_offset, payload, body) from an iterator of (offset, task).
+    Batches never span an offset gap (tasks skipped on resume). Without a sizer,
+    batches hold `batch` tasks and body is None; with one, tasks are serialized
+    once and packed up to the sizer's current byte budget (and at most `batch`).
+    """
+    start: Optional[int] = None
+    payload: List[Dict[str, Any]] = []
+    parts: List[bytes] = []
+    size = 2
+    for offset, t in it:
+        part = json.dumps(t, ensure_ascii=False).encode("utf-8") if sizer is not None else b""
+        if payload and (
+            offset != start + len(payload)
+            or len(payload) >= batch
+            or (sizer is not None and size + len(part) + 1 > sizer.budget)
+        ):
+            yield start, payload, (b"[" + b",".join(parts) + b"]" if sizer is not None else None)
+            payload, parts, size = [], [], 2
+        if not payload:
+            start = offset
+        payload.append(t)
+        if sizer is not None:
+            parts.append(part)
+            size += len(part) + 1
+    if payload:
+        yield start, payload, (b"[" + b",".join(parts) + b"]" if sizer is not None else None)
+
+
+class ImportBatchError(RuntimeError):
+    """Some import batches were not committed. `failed_ranges` holds half-open
+    task offsets (start, end) into the import stream; end is None for the tail
+    that was never sent. `committed` is the number of tasks that did land.
+    """
+
+    def __init__(self, message: str, failed_ranges: List[Tuple[int, Optional[int]]], committed: int):
+        super().__init__(message)
+        self.failed_ranges = failed_ranges
+        self.committed = committed
+
+
+def _describe_ranges(failures: List[Tuple[int, int, int, Exception]], unsent_from: Optional[int]) -> str:
+    parts = [
+        f"batch {no} (tasks {start}-{end - 1}): {err}" if no else f"tasks {start}-{end - 1}: {err}"
+        for no, start, end, err in failures
+    ]
+    if unsent_from is not None:
+        parts.append(f"tasks {unsent_from}+ were not sent")
+    return "; ".join(parts)
+
+
+def import_in_batches(
+    client,
+    project_id: int,
+    items: Iterable[Dict[str, Any]],
+    batch: int = 1000,
+    progress=None,
+    total: Optional[int] = None,
+    workers: int = 1,
+    byte_budget: Optional[int] = None,
+    journal: Optional[ImportJournal] = None,
+) -> int:
+    """Import tasks in batches of `batch`, with up to `workers` batches in flight.
+    `items` may be a list or any iterable (e.g. the streaming pipeline); only the
+    in-flight batches are materialised. Progress reports the contiguous prefix of
+    committed tasks, so it only moves forward in order. `total` is used for
+    progress when `items` has no len(). Returns tasks sent; raises
+    ImportBatchError listing the exact task ranges that were not committed.
+
+    With `byte_budget`, batches are packed by serialized size instead (`batch`
+    becomes a cap on tasks per batch) and the budget adapts to response latency.
+    A 413 splits the rejected batch in half and resends it; a 504 shrinks the
+    budget but is reported as a failure, since the server may have committed it.
+
+    With a `journal`, task offsets it already records as committed are skipped
+    (resume) and every committed batch is recorded in it before moving on.
+    """
+    if total is None and hasattr(items, "__len__"):
+        total = len(items)
+    workers = max(1, int(workers))
+    sizer = AdaptiveBatchSizer(budget=byte_budget) if byte_budget else None
+    indexed = journal.pending(items) if journal is not None else enumerate(items)
+    batches = _task_batches(indexed, batch, sizer)
+    exhausted = False
+    next_start = 0
+    batch_no = 0
+    retry: deque = deque()  # (start, payload) of rejected batches split for resend
+    inflight: Dict[Any, Tuple[int, int, List[Dict[str, Any]]]] = {}
+    finished: Dict[int, int] = {}  # start -> end, waiting for the ordered prefix
+    failures: List[Tuple[int, int, int, Exception]] = []
+    sent = 0
+    committed = 0
+    if journal is not None:
+        finished.update(journal.committed_ranges())
+        committed = journal.committed_count
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # Keep the window full; stop feeding new batches after the first failure
+            while not failures and len(inflight) < workers:
+                if retry:
+                    start, payload = retry.popleft()
+                    body = None
+                else:
+                    nxt = None if exhausted else next(batches, None)
+                    if nxt is None:
+                        exhausted = True
+                        break
+                    start, payload, body = nxt
+                    next_start = start + len(payload)
+                batch_no += 1
+                fut = pool.submit(_import_batch, client, project_id, payload, body)
+                inflight[fut] = (batch_no, start, payload)
+            if not inflight:
+                break
+
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                no, start, payload = inflight.pop(fut)
+                end = start + len(payload)
+                try:
+                    latency = fut.result()
+                except Exception as e:
+                    status = _error_status(e)
+                    if sizer is not None and status in (413, 504):
+                        sizer.shrink()
+                        if status == 413 and len(payload) > 1:
+                            half = len(payload) // 2
+                            retry.append((start, payload[:half]))
+                            retry.append((start + half, payload[half:]))
+                            continue
+                    failures.append((no, start, end, e))
+                    continue
+                if sizer is not None:
+                    sizer.observe(latency)
+                if journal is not None:
+                    journal.record(start, end)
+                finished[start] = end
+                committed += end - start
+
+            while sent in finished:
+                sent = finished.pop(sent)
+            if progress is not None:
+                if total:
+                    progress.progress(min(int(sent / total * 100), 100), text=f"Imported {sent}/{total}")
+                else:
+                    progress.progress(0, text=f"Imported {sent}")
+
+    # Task and annotation counts changed, even if some batches failed
+    invalidate_project(client, project_id)
+    if failures or retry:
+        failures.extend((0, start, start + len(payload), RuntimeError("not resent after an earlier failure")) for start, payload in retry)
+        failures.sort(key=lambda f: f[1])
+        unsent_from = None if exhausted else next_start
+        failed_ranges: List[Tuple[int, Optional[int]]] = [(start, end) for _, start, end, _ in failures]
+        if unsent_from is not None:
+            failed_ranges.append((unsent_from, None))
+        raise ImportBatchError(
+            f"Failed to import {len(failures)} batch(es), {committed} tasks committed. "
+            f"Not committed: {_describe_ranges(failures, unsent_from)}",
+            failed_ranges,
+            committed,
+        )
+    return committed
+
+
+def stream_merge_import(
+    client,
+    dst_id: int,
+    sources: List[Iterable[Dict[str, Any]]],
+    rewrite: Callable[[Dict[str, Any]], Dict[str, Any]],
+    dedup_field: Optional[str],
+    batch: int = 1000,
+    progress=None,
+    total: Optional[int] = None,
+    workers: int = 1,
+    byte_budget: Optional[int] = None,
+    journal: Optional[ImportJournal] = None,
+    near_dup_distance: Optional[int] = None,
+    near_dup_workers: Optional[int] = None,
+    parallel_plan: Optional[RewritePlan] = None,
+    processes: Optional[int] = None,
+) -> Tuple[int, int]:
+    """export -> rewrite -> dedup -> batched import as one generator chain.
+    With `parallel_plan`, rewrite and dedup keys run on `processes` worker
+    processes instead of calling `rewrite` here (same order and result).
+    With `near_dup_distance`, images in data[dedup_field] are also near-deduped.
+    `sources` are lazy per-project task iterators (iter_export_stream /
+    iter_export_snapshot), consumed in order. Memory is one import batch plus
+    the dedup keys, which spill to disk when `total` is large. Returns (imported, dropped).
+    """
+    stats: Dict[str, int] = {}
+    tasks = itertools.chain.from_iterable(sources)
+    if parallel_plan is not None:
+        keyed = iter_rewrite_keyed(tasks, parallel_plan, dedup_field, workers=processes)
+        unique = dedup_keyed_iter(keyed, stats, estimated_keys=total)
+    else:
+        unique = dedup_iter((rewrite(t) for t in tasks), dedup_field, stats, estimated_keys=total)
+    if near_dup_distance is not None and dedup_field:
+        unique = near_dedup(client, unique, dedup_field, near_dup_distance, near_dup_workers, stats)
+    imported = import_in_batches(
+        client,
+        dst_id,
+        unique,
+        batch=batch,
+        progress=progress,
+        total=total,
+        workers=workers,
+        byte_budget=byte_budget,
+        journal=journal,
+    )
+    return imported, stats.get("dropped", 0) + stats.get("near_dropped", 0)
+
+
+def projects_dataframe(projects: List[Any]) -> pd.DataFrame:
+    rows = []
+    for p in projects:
+        rows.append(
+            dict(
+                id=_safe_attr(p, "id"),
+                title=_safe_attr(p, "title"),
+                description=_safe_attr(p, "description"),
+                created_at=_safe_attr(p, "created_at"),
+                updated_at=_safe_attr(p, "updated_at"),
+                task_number=_safe_attr(p, "task_number"),
+                annotation_number=_safe_attr(p, "annotation_number"),
+            )
+        )
+    return pd.DataFrame(rows)
+
+
+def _first_int(obj: Any, *names: str) -> Optional[int]:
+    for name in names:
+        value = _safe_attr(obj, name)
+        if value is not None:
+            return int(value)
+    return None
+
+
+def count_tasks_and_annotations(client, project_id: int, project: Any = None) -> Tuple[int, int]:
+    """(tasks, annotations) of a project from the cheapest source available:
+    the project's own counters, then the totals of a one-task Data Manager
+    page, and only then a scan of every task's annotation count.
+    """
+    if project is None:
+        project = get_project(client, project_id)
+    task_count = _first_int(project, "task_number")
+    annotation_count = _first_int(project, "total_annotations_number")
+    if task_count is not None and annotation_count is not None:
+        return task_count, annotation_count
+
+    try:
+        # Page totals are computed server-side: one request regardless of project size
+        response = ls_request(
+            client,
+            "GET",
+            "/api/tasks/",
+            params={"project": project_id, "page": 1, "page_size": 1, "fields": "task_only", "include": "id"},
+        )
+        response.raise_for_status()
+        data = response.json()
+        if isinstance(data, dict) and data.get("total") is not None and data.get("total_annotations") is not None:
+            return int(data["total"]), int(data["total_annotations"])
+    except Exception as e:
+        log.debug("No task totals for project %s: %s", project_id, e)
+
+    # Older servers: legacy counter if it is non-zero, else walk the tasks
+    legacy = _first_int(project, "annotation_number")
+    if task_count is not None and legacy:
+        return task_count, legacy
+    report().info(f"Counting annotations for project {project_id}...")
+    task_count = annotation_count = 0
+    # Per-task counters only; annotation objects are downloaded only if the server has no counter
+    for task in tasks_iter(client, project_id, fields="task_only", page_size=1000, include="id,total_annotations"):
+        n = _safe_attr(task, "total_annotations")
+        if n is None:
+            break
+        task_count += 1
+        annotation_count += int(n)
+    else:
+        return task_count, annotation_count
+    task_count = annotation_count = 0
+    for task in tasks_iter(client, project_id, fields="all", page_size=1000, include="id,annotations"):
+        task_count += 1
+        annotation_count += len(_safe_attr(task, "annotations", []) or [])
+    return task_count, annotation_count
+
+
+def get_project_summary(client, project_id: int, refresh: bool = False) -> Dict[str, Any]:
+    """Get detailed project summary including accurate annotation count"""
+    key = _metadata_key(client, "summary", project_id)
+    if not refresh:
+        hit, summary = metadata_cache().get(key)
+        if hit:
+            return summary
+    try:
+        project = get_project(client, project_id, refresh)
+        
+        try:
+            task_count, annotation_count = count_tasks_and_annotations(client, project_id, project)
+        except Exception as e:
+            report().warning(f"Could not count annotations for project {project_id}: {e}")
+            # Not cached, so the next request counts again
+            return _summary_of(project, 0, 0)
+        
+        summary = _summary_of(project, task_count, annotation_count)
+        metadata_cache().put(key, summary)
+        return summary
+    except Exception as e:
+        return {
+            "id": project_id,
+            "title": f"Error loading project {project_id}",
+            "description": str(e),
+            "task_count": 0,
+            "annotation_count": 0,
+            "label_config": ""
+        }
+
+
+def _summary_of(project: Any, task_count: int, annotation_count: int) -> Dict[str, Any]:
+    return {
+        "id": _safe_attr(project, "id"),
+        "title": _safe_attr(project, "title"),
+        "description": _safe_attr(project, "description"),
+        "task_count": task_count,
+        "annotation_count": annotation_count,
+        "label_config": label_config_of(project)
+    }
+
+
+def source_state(client, project_ids: List[int]) -> List[Dict[str, Any]]:
+    """Task count and newest task `updated_at` of each source project, read
+    fresh from the server. A streamed import's offsets index the deduped
+    stream, so they only stay valid while these are unchanged.
+    """
+    newest_first = json.dumps({"ordering": ["-tasks:updated_at"]})
+    state = []
+    for pid in project_ids:
+        updated = None
+        try:
+            for t in tasks_iter(client, pid, fields="task_only", page_size=1, query=newest_first, include="id,updated_at"):
+                updated = _task_version(t)[1]
+                break
+        except Exception as e:
+            log.debug("No updated_at for project %s: %s", pid, e)
+        task_number = _safe_attr(get_project(client, pid, refresh=True), "task_number")
+        state.append({"id": int(pid), "task_number": task_number, "updated_at": updated})
+    return state
+
+
+def project_summaries(client, project_ids: List[int], max_workers: int = EXPORT_WORKERS) -> List[Dict[str, Any]]:
+    """get_project_summary for several projects on a bounded thread pool, in `project_ids` order."""
+    if not project_ids:
+        return []
+    bind_thread = report().thread_initializer()
+
+    def run(pid: int) -> Dict[str, Any]:
+        bind_thread()
+        return get_project_summary(client, pid)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(project_ids)))) as pool:
+        return list(pool.map(run, project_ids))
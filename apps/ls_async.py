@@ -0,0 +1,278 @@
+"""Asyncio Label Studio client for stream and snapshot exports.
+
+Sits alongside the sync helpers in ls_api.py and returns the same shapes
+(tasks_iter -> task dicts, build_export_stream / build_export_snapshot ->
+list[task]), so the UI can switch engines. Many projects and pages stay in
+flight on a single thread instead of blocking the script thread per request.
+"""
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+try:
+    import aiohttp
+except Exception:
+    aiohttp = None
+
+from ls_export import export_item, read_snapshot_tasks, task_projection
+
+DEFAULT_CONCURRENCY = 4
+POOL_SIZE = 16
+READ_TIMEOUT = 300  # seconds per socket read
+DOWNLOAD_CHUNK = 1 << 20
+
+
+class AsyncLabelStudio:
+    """aiohttp-based client; use as `async with AsyncLabelStudio(...) as ls:`.
+
+    `auth_header` is the Authorization value negotiated by the sync client
+    (see ls_auth_headers in ls_api.py); `refresh_auth` is a blocking callable that
+    returns a fresh one and is run in a worker thread after a 401. `retry` is
+    the sync client's RetryPolicy (attempts / statuses / delay()); without it
+    each request is tried once. `governor` is the server's RateGovernor, so
+    async traffic counts against the same rate and in-flight limits.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        auth_header: str,
+        refresh_auth: Optional[Callable[[], str]] = None,
+        pool_size: int = POOL_SIZE,
+        retry=None,
+        governor=None,
+    ):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp not found. Please `pip install aiohttp` to use the async engine.")
+        self.base_url = base_url.rstrip('/')
+        self.auth_header = auth_header
+        self._refresh_auth = refresh_auth
+        self._pool_size = pool_size
+        self._retry = retry
+        self._governor = governor
+        self._session = None
+
+    async def __aenter__(self) -> "AsyncLabelStudio":
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self._pool_size),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=READ_TIMEOUT),
+            headers={"Accept-Encoding": "gzip, deflate"},
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._session.close()
+
+    # ---- transport ----
+
+    async def _send(self, method: str, path: str, idempotent: Optional[bool] = None, **kwargs):
+        """Open a response (caller must release it); one reauth + resend on 401.
+        Transient failures follow the same rules as http_request in ls_api.py:
+        non-idempotent requests only retry on connect errors and 429/503.
+        """
+        url = path if path.startswith(("http://", "https://")) else f"{self.base_url}{path}"
+        if "params" in kwargs:
+            kwargs["params"] = {k: str(v) for k, v in kwargs["params"].items()}
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+        attempts = self._retry.attempts if self._retry is not None else 1
+        reauthed = False
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                resp = await self._governed_request(method, url, **kwargs)
+            except (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError, asyncio.TimeoutError) as e:
+                safe = idempotent or isinstance(e, aiohttp.ClientConnectorError)
+                if attempt >= attempts or not safe:
+                    raise
+                await asyncio.sleep(self._retry.delay(attempt))
+                continue
+            if resp.status == 401 and not reauthed and self._refresh_auth is not None:
+                resp.release()
+                reauthed = True
+                self.auth_header = await asyncio.to_thread(self._refresh_auth)
+                continue
+            if (
+                attempt < attempts
+                and resp.status in self._retry.statuses
+                and (idempotent or resp.status in (429, 503))
+            ):
+                delay = self._retry.delay(attempt, resp.headers.get("Retry-After"))
+                resp.release()
+                await asyncio.sleep(delay)
+                continue
+            return resp
+
+    async def _governed_request(self, method: str, url: str, **kwargs):
+        if self._governor is None:
+            return await self._session.request(method, url, headers={"Authorization": self.auth_header}, **kwargs)
+        # The governor blocks, so wait for a slot off the event loop
+        acquired = asyncio.ensure_future(asyncio.to_thread(self._governor.acquire))
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            # The worker thread still gets the slot; hand it back once it does
+            acquired.add_done_callback(
+                lambda f: f.cancelled() or f.exception() is not None or self._governor.release()
+            )
+            raise
+        try:
+            return await self._session.request(method, url, headers={"Authorization": self.auth_header}, **kwargs)
+        finally:
+            self._governor.release()
+
+    async def request_json(self, method: str, path: str, **kwargs) -> Any:
+        resp = await self._send(method, path, **kwargs)
+        async with resp:
+            resp.raise_for_status()
+            return await resp.json(content_type=None)
+
+    # ---- stream export ----
+
+    async def tasks_iter(
+        self,
+        project_id: int,
+        fields: str = "all",
+        page_size: int = 1000,
+        prefetch: int = DEFAULT_CONCURRENCY,
+        include: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield tasks in page order; once the first page reports a total, the
+        remaining pages are fetched `prefetch` at a time. `include` narrows the
+        task fields (Data Manager endpoint, see ls_export.task_projection).
+        """
+        if include is None:
+            path, params = f"/api/projects/{project_id}/tasks/", {"fields": fields}
+        else:
+            path, params = "/api/tasks/", {"project": project_id, "fields": fields, "include": include}
+
+        async def fetch_page(page: int) -> Any:
+            return await self.request_json("GET", path, params={**params, "page": page, "page_size": page_size})
+
+        def page_tasks(data: Any) -> List[Dict[str, Any]]:
+            return data.get("results", data.get("tasks")) or []
+
+        data = await fetch_page(1)
+        if isinstance(data, list):
+            for t in data:
+                yield t
+            return
+
+        first = page_tasks(data)
+        for t in first:
+            yield t
+        seen = len(first)
+        total = data.get("count", data.get("total"))
+        if total is not None and prefetch > 1 and first:
+            # Page count from what the server returned: it may cap page_size (TASK_API_PAGE_SIZE_MAX)
+            pages = iter(range(2, -(-int(total) // len(first)) + 1))
+            inflight = [asyncio.ensure_future(fetch_page(p)) for p in itertools.islice(pages, prefetch)]
+            try:
+                while inflight:
+                    page_data = await inflight.pop(0)
+                    for p in itertools.islice(pages, 1):
+                        inflight.append(asyncio.ensure_future(fetch_page(p)))
+                    for t in page_tasks(page_data):
+                        yield t
+                        seen += 1
+            finally:
+                for fut in inflight:
+                    fut.cancel()
+        else:
+            page = 1
+            # The Data Manager endpoint has no "next" link; page until the total is reached
+            while page_tasks(data) and (data.get("next") if "next" in data else total is not None and seen < int(total)):
+                page += 1
+                data = await fetch_page(page)
+                seen += len(page_tasks(data))
+                for t in page_tasks(data):
+                    yield t
+        if total is not None and seen != int(total):
+            raise RuntimeError(f"Got {seen} of {total} tasks for project {project_id} (project changed during export?)")
+
+    async def build_export_stream(
+        self,
+        project_id: int,
+        include_annotations: bool = True,
+        include_predictions: bool = False,
+        prefetch: int = DEFAULT_CONCURRENCY,
+    ) -> List[Dict[str, Any]]:
+        fields, include = task_projection(include_annotations, include_predictions)
+        return [
+            export_item(t, include_annotations, include_predictions)
+            async for t in self.tasks_iter(project_id, fields, prefetch=prefetch, include=include)
+        ]
+
+    # ---- snapshot export ----
+
+    async def create_snapshot(self, project_id: int) -> Dict[str, Any]:
+        return await self.request_json(
+            "POST", f"/api/projects/{project_id}/exports/", idempotent=True, json={"title": f"snapshot-{project_id}"}
+        )
+
+    async def wait_snapshot(self, project_id: int, snap: Dict[str, Any], poll_seconds: int = 2, timeout: int = 1800) -> Dict[str, Any]:
+        start = time.time()
+        while snap.get("status", "") not in ("completed", "failed", "error"):
+            await asyncio.sleep(poll_seconds)
+            snap = await self.request_json("GET", f"/api/projects/{project_id}/exports/{snap['id']}/")
+            if time.time() - start > timeout:
+                raise TimeoutError(f"Snapshot export timed out for project {project_id}")
+        if snap.get("status") != "completed":
+            raise RuntimeError(f"Snapshot export ended with status '{snap.get('status')}' for project {project_id}")
+        return snap
+
+    async def download_snapshot(self, project_id: int, snap_id: int, dest: str) -> None:
+        """Stream the snapshot ZIP to `dest` in chunks."""
+        resp = await self._send("GET", f"/api/projects/{project_id}/exports/{snap_id}/download/")
+        async with resp:
+            resp.raise_for_status()
+            with open(dest, "wb") as f:
+                async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK):
+                    f.write(chunk)
+
+    async def build_export_snapshot(self, project_id: int, poll_seconds: int = 2, timeout: int = 1800) -> List[Dict[str, Any]]:
+        snap = await self.wait_snapshot(project_id, await self.create_snapshot(project_id), poll_seconds, timeout)
+        fd, tmp = tempfile.mkstemp(prefix=f"snapshot_{project_id}_", suffix=".zip")
+        os.close(fd)
+        try:
+            await self.download_snapshot(project_id, snap["id"], tmp)
+            return await asyncio.to_thread(read_snapshot_tasks, tmp)
+        finally:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    # ---- multi-project ----
+
+    async def export_projects(
+        self,
+        project_ids: List[int],
+        use_snapshot: bool = False,
+        include_annotations: bool = True,
+        include_predictions: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        prefetch: int = DEFAULT_CONCURRENCY,
+    ) -> List[List[Dict[str, Any]]]:
+        """Export several projects at once; results are in `project_ids` order."""
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def one(pid: int) -> List[Dict[str, Any]]:
+            async with sem:
+                try:
+                    if use_snapshot:
+                        return await self.build_export_snapshot(pid)
+                    return await self.build_export_stream(pid, include_annotations, include_predictions, prefetch)
+                except Exception as e:
+                    raise RuntimeError(f"Export failed for project {pid}: {e}")
+
+        return list(await asyncio.gather(*(one(pid) for pid in project_ids)))
+
+
+def run(coro):
+    """Run a coroutine from sync code (e.g. the Streamlit script thread)."""
+    return asyncio.run(coro)
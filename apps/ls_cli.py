@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Headless Label Studio merge: export -> rewrite -> dedup -> create -> import
+Same pipeline as the Streamlit app (app.py), driven by flags or a job file.
+
+Examples:
+  python ls_cli.py --url http://localhost:8082 --api-key $LS_API_KEY \
+      --projects 12 15 31 --title "Merged reef survey" --dedup-field image
+  python ls_cli.py --job nightly_merge.yaml
+
+A job file (YAML, or JSON) holds the same settings keyed by their flag names
+with underscores (e.g. `dedup_field: image`), plus an optional `rules` list in
+the Field Rewriter rule format (see ls_rewrite.RewritePlan). Flags given on
+the command line override the job file. The API key may also come from the
+LABEL_STUDIO_API_KEY environment variable.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+try:
+    import yaml
+except Exception:
+    yaml = None
+
+from ls_api import (
+    EXPORT_WORKERS,
+    HTTP_POOL_SIZE,
+    ClientView,
+    ImportBatchError,
+    RetryPolicy,
+    _safe_attr,
+    build_export_snapshot,
+    build_export_stream,
+    concat_and_dedup,
+    connect_ls,
+    create_project,
+    export_projects_parallel,
+    get_project,
+    import_in_batches,
+    iter_export_snapshot,
+    iter_export_stream,
+    label_config_of,
+    near_dedup,
+    rate_governor,
+    source_state,
+    stream_merge_import,
+    task_cache,
+)
+from ls_journal import ImportJournal, fingerprint_config, fingerprint_tasks
+from ls_parallel import PARALLEL_MIN_TASKS, rewrite_keyed_lists
+from ls_phash import DEFAULT_DISTANCE
+from ls_rewrite import RewritePlan
+
+log = logging.getLogger("ls_cli")
+
+# Job-file keys and their defaults (also the argparse dests)
+DEFAULTS: Dict[str, Any] = {
+    "url": "http://localhost:8082",
+    "api_key": None,
+    "projects": [],
+    "title": None,
+    "description": "",
+    "snapshot": False,
+    "annotations": True,
+    "predictions": False,
+    "prefetch": 4,
+    "task_cache": True,
+    "export_workers": EXPORT_WORKERS,
+    "renames": "file_upload:",
+    "prefix_field": "image",
+    "prefix_base": "",
+    "strip_dirs": True,
+    "regex_field": "",
+    "regex_pattern": "",
+    "regex_repl": "",
+    "rules": [],
+    "dedup_field": "image",
+    "near_dup": None,
+    "near_dup_workers": None,
+    "parallel_rewrite": None,
+    "streaming": False,
+    "batch_size": 1000,
+    "import_workers": 1,
+    "batch_budget_mb": None,
+    "output": None,
+    "dry_run": False,
+    "pool_size": HTTP_POOL_SIZE,
+    "retry_attempts": 5,
+    "retry_backoff": 0.5,
+    "rate_limit": 0.0,
+    "rate_burst": 10,
+    "max_in_flight": 0,
+    "resume": True,
+}
+
+
+class LogProgress:
+    """Stands in for st.progress: logs every 10% step."""
+
+    def __init__(self):
+        self._last = -10
+
+    def progress(self, value: int, text: str = "") -> None:
+        if value >= self._last + 10 or value == 100:
+            self._last = value
+            log.info(text or f"{value}%")
+
+
+def parse_renames(spec: str) -> Dict[str, str]:
+    """'old:new, other:' -> {"old": "new", "other": ""} (same format as the app)."""
+    renames: Dict[str, str] = {}
+    for part in [p.strip() for p in (spec or "").split(",") if p.strip()]:
+        if ":" in part:
+            old, new = part.split(":", 1)
+            renames[old.strip()] = new.strip()
+    return renames
+
+
+def load_job(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.lower().endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise RuntimeError("PyYAML not found. Please `pip install pyyaml` or use a JSON job file.")
+        job = yaml.safe_load(text) or {}
+    else:
+        job = json.loads(text)
+    unknown = sorted(set(job) - set(DEFAULTS))
+    if unknown:
+        raise RuntimeError(f"Unknown job file keys: {', '.join(unknown)}")
+    return job
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Merge Label Studio projects without the Streamlit UI.")
+    # Every default is None so that only flags given on the command line override the job file
+    p.set_defaults(**{k: None for k in DEFAULTS})
+    p.add_argument("--job", help="YAML or JSON job file")
+    p.add_argument("--url", help="Label Studio base URL")
+    p.add_argument("--api-key", help="API key / PAT (default: $LABEL_STUDIO_API_KEY)")
+    p.add_argument("--projects", type=int, nargs="+", help="Source project ids, merged in this order")
+    p.add_argument("--title", help="Title of the merged project")
+    p.add_argument("--description")
+
+    g = p.add_argument_group("export")
+    g.add_argument("--snapshot", action="store_true", default=None, help="Use snapshot export")
+    g.add_argument("--no-annotations", dest="annotations", action="store_false", default=None)
+    g.add_argument("--predictions", action="store_true", default=None)
+    g.add_argument("--prefetch", type=int, help="Task pages fetched concurrently per project")
+    g.add_argument("--export-workers", type=int, help="Projects exported at once")
+    g.add_argument(
+        "--no-task-cache", dest="task_cache", action="store_false", default=None,
+        help="Re-download every task instead of only those updated since the last export",
+    )
+
+    g = p.add_argument_group("rewrite")
+    g.add_argument("--renames", help="Key renames, 'old:new,other:' (empty new deletes)")
+    g.add_argument("--prefix-field")
+    g.add_argument("--prefix-base", help="Base URL prepended to --prefix-field")
+    g.add_argument("--no-strip-dirs", dest="strip_dirs", action="store_false", default=None)
+    g.add_argument("--regex-field")
+    g.add_argument("--regex-pattern")
+    g.add_argument("--regex-repl")
+
+    g = p.add_argument_group("dedup")
+    g.add_argument("--dedup-field", help="Data field to de-duplicate on ('' hashes the data dict)")
+    g.add_argument("--near-dup", type=int, metavar="BITS", help=f"Also drop perceptual near-duplicate images (e.g. {DEFAULT_DISTANCE})")
+    g.add_argument("--near-dup-workers", type=int)
+    g.add_argument("--parallel-rewrite", type=int, metavar="PROCESSES", help=f"Rewrite/hash on worker processes ({PARALLEL_MIN_TASKS:,}+ tasks)")
+
+    g = p.add_argument_group("import")
+    g.add_argument("--streaming", action="store_true", default=None, help="Stream export -> import without holding the merge in memory")
+    g.add_argument("--batch-size", type=int)
+    g.add_argument("--import-workers", type=int)
+    g.add_argument("--batch-budget-mb", type=int, help="Adaptive batch sizing starting from this many MB")
+    g.add_argument("--output", help="Also write the merged tasks to this JSON file")
+    g.add_argument("--dry-run", action="store_true", default=None, help="Export and merge only; do not create or import")
+    g.add_argument("--no-resume", dest="resume", action="store_false", default=None, help="Ignore interrupted-import checkpoints")
+
+    g = p.add_argument_group("connection")
+    g.add_argument("--pool-size", type=int)
+    g.add_argument("--retry-attempts", type=int)
+    g.add_argument("--retry-backoff", type=float)
+    g.add_argument("--rate-limit", type=float, help="Max requests/s (0 = unlimited)")
+    g.add_argument("--rate-burst", type=int)
+    g.add_argument("--max-in-flight", type=int, help="Max concurrent requests (0 = unlimited)")
+    p.add_argument("-v", "--verbose", action="store_true")
+    return p
+
+
+def resolve_settings(args: argparse.Namespace) -> Dict[str, Any]:
+    cfg = dict(DEFAULTS)
+    if args.job:
+        cfg.update(load_job(args.job))
+    cfg.update({k: v for k, v in vars(args).items() if k in DEFAULTS and v is not None})
+    cfg["api_key"] = cfg["api_key"] or os.environ.get("LABEL_STUDIO_API_KEY")
+    if not cfg["api_key"]:
+        raise RuntimeError("No API key: pass --api-key, set api_key in the job file or LABEL_STUDIO_API_KEY")
+    if len(cfg["projects"]) < 1:
+        raise RuntimeError("No source projects: pass --projects or set projects in the job file")
+    if not cfg["title"] and not cfg["dry_run"]:
+        raise RuntimeError("No title for the merged project: pass --title or set title in the job file")
+    return cfg
+
+
+def run_job(cfg: Dict[str, Any]) -> int:
+    client = ClientView(
+        connect_ls(cfg["url"], cfg["api_key"], int(cfg["pool_size"])),
+        RetryPolicy(attempts=int(cfg["retry_attempts"]), backoff=float(cfg["retry_backoff"])),
+    )
+    rate_governor(client.url).configure(float(cfg["rate_limit"]), int(cfg["rate_burst"]), int(cfg["max_in_flight"]))
+
+    ids: List[int] = [int(p) for p in cfg["projects"]]
+    dedup_field: Optional[str] = cfg["dedup_field"] or None
+    plan = RewritePlan.from_settings(
+        renames=parse_renames(cfg["renames"]),
+        prefix_field=cfg["prefix_field"] or None,
+        base_url=cfg["prefix_base"] or None,
+        strip_dirs=bool(cfg["strip_dirs"]),
+        regex_field=cfg["regex_field"] or None,
+        regex_pattern=cfg["regex_pattern"] or None,
+        regex_repl=cfg["regex_repl"] or None,
+        extra_rules=cfg["rules"],
+    )
+    byte_budget = int(cfg["batch_budget_mb"]) << 20 if cfg["batch_budget_mb"] else None
+    cache = task_cache() if cfg["task_cache"] else None
+    processes = cfg["parallel_rewrite"]
+
+    if cfg["streaming"]:
+        if cfg["dry_run"] or cfg["output"]:
+            raise RuntimeError("--streaming imports directly; it cannot be combined with --dry-run or --output")
+        fingerprint = fingerprint_config({
+            "projects": ids,
+            "snapshot": cfg["snapshot"],
+            "annotations": cfg["annotations"],
+            "predictions": cfg["predictions"],
+            "rules": plan.rules,
+            "dedup_field": cfg["dedup_field"],
+            "near_dup": cfg["near_dup"],
+        })
+        sources = [
+            iter_export_snapshot(client, pid) if cfg["snapshot"] else iter_export_stream(
+                client, pid, cfg["annotations"], cfg["predictions"], prefetch=int(cfg["prefetch"]), cache=cache
+            )
+            for pid in ids
+        ]
+        # Upper bound from the projects' task_number, for progress and the dedup index
+        counts = [_safe_attr(get_project(client, pid), "task_number") for pid in ids]
+        estimate = sum(counts) if all(isinstance(c, int) for c in counts) else None
+        dst_id, journal = _target_project(client, cfg, ids, fingerprint, total=None, streamed=True)
+        imported, dropped = stream_merge_import(
+            client,
+            dst_id,
+            sources,
+            plan.apply,
+            dedup_field,
+            batch=int(cfg["batch_size"]),
+            progress=LogProgress(),
+            total=estimate,
+            workers=int(cfg["import_workers"]),
+            byte_budget=byte_budget,
+            journal=journal,
+            near_dup_distance=cfg["near_dup"],
+            near_dup_workers=cfg["near_dup_workers"],
+            parallel_plan=plan if processes else None,
+            processes=processes,
+        )
+        journal.complete()
+        log.info("Imported %d tasks into project %d (dropped %d duplicates)", imported, dst_id, dropped)
+        return dst_id
+
+    def export_one(pid: int, on_progress=None) -> List[Dict[str, Any]]:
+        if cfg["snapshot"]:
+            return build_export_snapshot(client, project_id=pid)
+        return build_export_stream(
+            client,
+            project_id=pid,
+            include_annotations=cfg["annotations"],
+            include_predictions=cfg["predictions"],
+            on_progress=on_progress,
+            prefetch=int(cfg["prefetch"]),
+            cache=cache,
+        )
+
+    log.info("Exporting projects %s", ", ".join(map(str, ids)))
+    data_lists = export_projects_parallel(ids, export_one, max_workers=int(cfg["export_workers"]))
+    for pid, data_list in zip(ids, data_lists):
+        log.info("Project %d: %d tasks", pid, len(data_list))
+
+    total = sum(len(l) for l in data_lists)
+    keys = None
+    if processes and total >= PARALLEL_MIN_TASKS:
+        exports, keys = rewrite_keyed_lists(data_lists, plan, dedup_field, workers=processes)
+    else:
+        exports = [plan.apply_many(l) for l in data_lists]
+    merged, dropped = concat_and_dedup(exports, dedup_field, keys=keys)
+    if cfg["near_dup"] is not None and dedup_field:
+        stats: Dict[str, int] = {}
+        merged = list(near_dedup(client, merged, dedup_field, int(cfg["near_dup"]), cfg["near_dup_workers"], stats))
+        dropped += stats["near_dropped"]
+        if stats["unhashed"]:
+            log.warning("%d images could not be fetched for hashing and were kept", stats["unhashed"])
+    log.info("Merged %d tasks (dropped %d duplicates)", len(merged), dropped)
+
+    if cfg["output"]:
+        with open(cfg["output"], "w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False)
+        log.info("Wrote %s", cfg["output"])
+    if cfg["dry_run"]:
+        return 0
+
+    dst_id, journal = _target_project(client, cfg, ids, fingerprint_tasks(merged), total=len(merged))
+    import_in_batches(
+        client,
+        dst_id,
+        merged,
+        batch=int(cfg["batch_size"]),
+        progress=LogProgress(),
+        workers=int(cfg["import_workers"]),
+        byte_budget=byte_budget,
+        journal=journal,
+    )
+    journal.complete()
+    log.info("Imported %d tasks into project %d", len(merged), dst_id)
+    return dst_id
+
+
+def _target_project(
+    client, cfg: Dict[str, Any], ids: List[int], fingerprint: str, total: Optional[int], streamed: bool = False
+):
+    """(project id, journal): resume an interrupted import of the same tasks, else create the project.
+    Streamed imports only resume while the source projects are unchanged."""
+    journal = ImportJournal.find(client.url, fingerprint) if cfg["resume"] else None
+    sources = source_state(client, ids) if streamed else None
+    if journal is not None and sources is not None and journal.sources_changed(sources):
+        log.warning(
+            "Source projects changed since the interrupted import into project %d; "
+            "not resuming it (offsets would shift) and importing into a new project",
+            journal.project_id,
+        )
+        journal = None
+    if journal is not None:
+        log.info(
+            "Resuming import into project %d (%d tasks already committed)", journal.project_id, journal.committed_count
+        )
+        return journal.project_id, journal
+    label_config = label_config_of(get_project(client, ids[0])) or ""
+    if not label_config.strip():
+        log.warning("First project has an empty label config; proceeding anyway")
+    dst_id = create_project(client, cfg["title"], label_config, cfg["description"])
+    log.info("Created project id=%d", dst_id)
+    return dst_id, ImportJournal.create(client.url, dst_id, fingerprint, total=total, sources=sources)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    try:
+        run_job(resolve_settings(args))
+    except ImportBatchError as e:
+        log.error("%s", e)
+        log.error("Progress is checkpointed; rerun the same job to send only the remaining batches.")
+        return 2
+    except Exception as e:
+        log.error("%s", e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Task dedup keys and seen-key indexes for merges.
+
+A task is keyed by its `dedup_field` value when set, otherwise by a 16-byte
+digest of its canonical `data` JSON. Digests are kept as raw bytes so a seen
+set of 1M keys stays small, and xxhash (XXH3-128) is used when installed,
+BLAKE2b otherwise.
+
+Merges expected to see more than DEDUP_SPILL_THRESHOLD keys use a
+SpillKeyIndex instead of a set: keys live in a temporary SQLite file behind
+an in-memory Bloom filter, so only possible repeats touch disk.
+"""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple, Union
+
+try:
+    import xxhash
+except Exception:
+    xxhash = None
+
+DIGEST_SIZE = 16
+# Compact, key-sorted JSON; check_circular is skipped because task data comes from JSON
+_CANONICAL = json.JSONEncoder(sort_keys=True, ensure_ascii=False, separators=(",", ":"), check_circular=False)
+
+if xxhash is not None:
+    DIGEST_NAME = "xxh3_128"
+
+    def _digest(blob: bytes) -> bytes:
+        return xxhash.xxh3_128_digest(blob)
+else:
+    DIGEST_NAME = "blake2b-128"
+
+    def _digest(blob: bytes) -> bytes:
+        return hashlib.blake2b(blob, digest_size=DIGEST_SIZE).digest()
+
+
+def canonical_json(data: Any) -> bytes:
+    return _CANONICAL.encode(data).encode("utf-8")
+
+
+def task_key(task: Dict[str, Any], dedup_field: Optional[str]) -> Union[str, bytes]:
+    """`dedup_field` value as str, else the binary content digest of task["data"]."""
+    return data_key(task.get("data", {}), dedup_field)
+
+
+def data_key(data: Dict[str, Any], dedup_field: Optional[str]) -> Union[str, bytes]:
+    if dedup_field and dedup_field in data and data[dedup_field] not in (None, ""):
+        return str(data[dedup_field])
+    return _digest(canonical_json(data))
+
+
+# ---- seen-key indexes ----
+
+DEDUP_SPILL_THRESHOLD = 2_000_000
+SPILL_BUFFER = 50_000
+BLOOM_ERROR_RATE = 0.01
+
+
+class MemoryKeyIndex:
+    """Seen keys in a Python set."""
+
+    def __init__(self):
+        self._seen: Set[Union[str, bytes]] = set()
+
+    def add(self, key: Union[str, bytes]) -> bool:
+        """Record `key`; True if it was not seen before."""
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        return True
+
+    def close(self) -> None:
+        self._seen = set()
+
+
+class BloomFilter:
+    """Bit-array Bloom filter over 16-byte digests (double hashing on the two halves)."""
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest: bytes) -> Iterator[int]:
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, digest: bytes) -> bool:
+        """Set the digest's bits; True if any was unset (the digest is definitely new)."""
+        new = False
+        bits = self._bits
+        for pos in self._positions(digest):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        return new
+
+
+class SpillKeyIndex:
+    """Seen keys in a temporary SQLite file, fronted by a Bloom filter.
+
+    Keys are reduced to 16-byte digests. A key the filter has never seen is
+    new without a lookup and is buffered for a batched insert; only filter
+    hits (repeats, plus ~`error_rate` false positives) query the database.
+    Memory is the filter (~1.2 bytes per expected key at 1%) plus the buffer.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float = BLOOM_ERROR_RATE,
+        directory: Optional[str] = None,
+        buffer: int = SPILL_BUFFER,
+    ):
+        self._bloom = BloomFilter(capacity, error_rate)
+        fd, self.path = tempfile.mkstemp(prefix="dedup_", suffix=".sqlite", dir=directory)
+        os.close(fd)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE keys (k BLOB PRIMARY KEY) WITHOUT ROWID")
+        self._pending: Set[bytes] = set()
+        self._buffer = buffer
+
+    @staticmethod
+    def _digest(key: Union[str, bytes]) -> bytes:
+        # Field values are hashed too so every stored key is 16 bytes
+        return key if isinstance(key, bytes) else _digest(b"field:" + key.encode("utf-8"))
+
+    def add(self, key: Union[str, bytes]) -> bool:
+        d = self._digest(key)
+        if not self._bloom.add(d):
+            if d in self._pending:
+                return False
+            if self._db.execute("SELECT 1 FROM keys WHERE k = ?", (d,)).fetchone():
+                return False
+        self._pending.add(d)
+        if len(self._pending) >= self._buffer:
+            self._flush()
+        return True
+
+    def _flush(self) -> None:
+        self._db.executemany("INSERT OR IGNORE INTO keys VALUES (?)", ((d,) for d in self._pending))
+        self._db.commit()
+        self._pending.clear()
+
+    def close(self) -> None:
+        self._db.close()
+        self._pending.clear()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def make_key_index(estimated_keys: Optional[int] = None, threshold: int = DEDUP_SPILL_THRESHOLD):
+    """SpillKeyIndex when the merge is expected to exceed `threshold` keys, else MemoryKeyIndex."""
+    if estimated_keys is not None and estimated_keys > threshold:
+        return SpillKeyIndex(capacity=estimated_keys)
+    return MemoryKeyIndex()
+
+
+def dedup_keyed_iter(
+    keyed: Iterable[Tuple[Union[str, bytes], Dict[str, Any]]],
+    stats: Optional[Dict[str, int]] = None,
+    estimated_keys: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """dedup_iter over (key, task) pairs whose keys were computed elsewhere
+    (e.g. in worker processes, see ls_parallel)."""
+    if stats is None:
+        stats = {}
+    stats.setdefault("dropped", 0)
+    index = make_key_index(estimated_keys)
+    try:
+        for k, t in keyed:
+            if index.add(k):
+                yield t
+            else:
+                stats["dropped"] += 1
+    finally:
+        index.close()
+
+
+def dedup_iter(
+    tasks: Iterable[Dict[str, Any]],
+    dedup_field: Optional[str],
+    stats: Optional[Dict[str, int]] = None,
+    estimated_keys: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield tasks whose key has not been seen; `stats["dropped"]` counts the rest.
+    Each task is hashed once and only keys are retained, never the tasks themselves.
+    `estimated_keys` (e.g. the summed task counts) picks the index via make_key_index.
+    """
+    return dedup_keyed_iter(((task_key(t, dedup_field), t) for t in tasks), stats, estimated_keys)
@@ -0,0 +1,163 @@
+"""UI-free helpers shared by the sync (app.py) and async (ls_async.py) exporters."""
+import io
+import json
+import zipfile
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Heuristics: try common names first
+SNAPSHOT_JSON_NAMES = [
+    "tasks.json",
+    "result.json",
+    "export.json",
+    "project.json",  # fallback (may contain metadata, not tasks)
+]
+# Some exports wrap tasks inside a dict under one of these keys
+SNAPSHOT_WRAPPER_KEYS = ("tasks", "result", "items", "data")
+
+
+def task_projection(include_annotations: bool, include_predictions: bool) -> Tuple[str, str]:
+    """(fields, include) task-list parameters asking the server for just what an
+    export keeps: "task_only" skips serializing annotations/predictions when
+    neither is needed, and `include` drops drafts and other task metadata.
+    """
+    include = ["id", "data", "updated_at"]
+    if include_annotations:
+        include.append("annotations")
+    if include_predictions:
+        include.append("predictions")
+    return ("all" if include_annotations or include_predictions else "task_only"), ",".join(include)
+
+
+def export_item(task: Dict[str, Any], include_annotations: bool, include_predictions: bool) -> Dict[str, Any]:
+    """Reduce an API task dict to data + annotation/prediction results."""
+    item: Dict[str, Any] = {"data": dict(task.get("data") or {})}
+    if include_annotations:
+        anns = [{"result": a.get("result", [])} for a in (task.get("annotations") or [])]
+        if anns:
+            item["annotations"] = anns
+    if include_predictions:
+        preds = [{"result": p.get("result", [])} for p in (task.get("predictions") or [])]
+        if preds:
+            item["predictions"] = preds
+    return item
+
+
+def _snapshot_json_name(zf: zipfile.ZipFile) -> str:
+    names = zf.namelist()
+    for name in SNAPSHOT_JSON_NAMES:
+        if name in names:
+            return name
+    # Fallback: first .json in the archive
+    for name in names:
+        if name.lower().endswith(".json"):
+            return name
+    raise RuntimeError("No JSON file found in snapshot ZIP")
+
+
+JSON_CHUNK = 1 << 16
+_JSON_WS = " \t\n\r"
+_DECODER = json.JSONDecoder()
+
+
+class _JsonStream:
+    """Minimal pull parser over a text stream: walks the outer array/object
+    token by token and decodes one element at a time with raw_decode, so only
+    the current element (plus one read chunk) is buffered.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        # Read at least as much as is buffered so retries on a large element stay linear
+        chunk = self.fp.read(max(JSON_CHUNK, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of input)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _JSON_WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        found = self.peek()
+        if found != ch:
+            raise ValueError(f"Malformed JSON: expected {ch!r}, got {found!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+                # A value ending exactly at the buffer edge may be a truncated number
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def array_items(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            sep = self.peek()
+            self.pos += 1
+            if sep == "]":
+                return
+            if sep != ",":
+                raise ValueError(f"Malformed JSON array: expected ',' or ']', got {sep!r}")
+
+
+def iter_json_tasks(fp) -> Iterator[Dict[str, Any]]:
+    """Yield tasks one at a time from an export JSON text stream: either a
+    top-level array or the first SNAPSHOT_WRAPPER_KEYS array of a wrapper object.
+    """
+    stream = _JsonStream(fp)
+    first = stream.peek()
+    if first == "[":
+        yield from stream.array_items()
+        return
+    if first == "{":
+        stream.pos += 1
+        while stream.peek() not in ("}", ""):
+            key = stream.value()
+            stream.expect(":")
+            if key in SNAPSHOT_WRAPPER_KEYS and stream.peek() == "[":
+                yield from stream.array_items()
+                return
+            stream.value()  # skip unrelated member
+            if stream.peek() == ",":
+                stream.pos += 1
+    raise RuntimeError("Snapshot JSON did not contain a list of tasks")
+
+
+def iter_snapshot_tasks(zip_source) -> Iterator[Dict[str, Any]]:
+    """Stream tasks out of a snapshot ZIP (path or binary file object) without
+    materialising the decompressed JSON or the full task list.
+    """
+    with zipfile.ZipFile(zip_source) as zf:
+        with zf.open(_snapshot_json_name(zf)) as member:
+            yield from iter_json_tasks(io.TextIOWrapper(member, encoding="utf-8-sig"))
+
+
+def read_snapshot_tasks(zip_source) -> List[Dict[str, Any]]:
+    """Extract the task list from a snapshot ZIP (path or binary file object)."""
+    return list(iter_snapshot_tasks(zip_source))
@@ -0,0 +1,139 @@
+"""On-disk checkpoint journal for resumable imports.
+
+One JSON file per import records the target project, a fingerprint of the
+task stream being imported and the task-offset ranges the server has
+committed. A resumed import skips the committed offsets and sends only the
+rest, into the same project.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+JOURNAL_DIR = Path.home() / ".ls_project_tool" / "imports"
+
+
+def fingerprint_tasks(tasks: Iterable[Dict[str, Any]]) -> str:
+    """Order-sensitive digest of a task list (identifies a merged export)."""
+    h = hashlib.blake2b(digest_size=16)
+    count = 0
+    for t in tasks:
+        h.update(json.dumps(t, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        h.update(b"\n")
+        count += 1
+    return f"tasks:{count}:{h.hexdigest()}"
+
+
+def fingerprint_config(config: Dict[str, Any]) -> str:
+    """Digest of the settings that regenerate a streamed import (sources, rewrites, dedup)."""
+    blob = json.dumps(config, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return f"config:{hashlib.blake2b(blob, digest_size=16).hexdigest()}"
+
+
+def _merge_ranges(ranges: List[List[int]]) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class ImportJournal:
+    """Committed task ranges of one import into one project, persisted after every batch."""
+
+    def __init__(self, path: Path, state: Dict[str, Any]):
+        self.path = path
+        self.state = state
+
+    @classmethod
+    def create(
+        cls,
+        base_url: str,
+        project_id: int,
+        fingerprint: str,
+        total: Optional[int] = None,
+        directory: Path = JOURNAL_DIR,
+        sources: Optional[List[Dict[str, Any]]] = None,
+    ) -> "ImportJournal":
+        """`sources` records the state of the source projects (see
+        ls_api.source_state) for streamed imports, whose offsets are only
+        stable while those projects are unchanged."""
+        now = time.time()
+        state = {
+            "base_url": base_url.rstrip('/'),
+            "project_id": int(project_id),
+            "fingerprint": fingerprint,
+            "total": total,
+            "sources": sources,
+            "committed": [],
+            "complete": False,
+            "created_at": now,
+            "updated_at": now,
+        }
+        journal = cls(Path(directory) / f"project_{int(project_id)}_{int(now)}.json", state)
+        journal._save()
+        return journal
+
+    @classmethod
+    def find(cls, base_url: str, fingerprint: str, directory: Path = JOURNAL_DIR) -> Optional["ImportJournal"]:
+        """Most recent incomplete journal for this server and task stream, if any."""
+        found: Optional[ImportJournal] = None
+        for path in Path(directory).glob("project_*.json"):
+            try:
+                state = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            if (
+                not state.get("complete")
+                and state.get("base_url") == base_url.rstrip('/')
+                and state.get("fingerprint") == fingerprint
+                and (found is None or state["updated_at"] > found.state["updated_at"])
+            ):
+                found = cls(path, state)
+        return found
+
+    @property
+    def project_id(self) -> int:
+        return self.state["project_id"]
+
+    @property
+    def committed_count(self) -> int:
+        return sum(end - start for start, end in self.state["committed"])
+
+    def sources_changed(self, sources: List[Dict[str, Any]]) -> bool:
+        """True if the recorded source state differs from `sources` (resuming would shift offsets)."""
+        recorded = self.state.get("sources")
+        return recorded is not None and recorded != sources
+
+    def committed_ranges(self) -> List[Tuple[int, int]]:
+        return [(start, end) for start, end in self.state["committed"]]
+
+    def pending(self, items: Iterable[Dict[str, Any]]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(offset, task) for every task whose offset is not yet committed."""
+        ranges = self.committed_ranges()
+        r = 0
+        for offset, task in enumerate(items):
+            while r < len(ranges) and offset >= ranges[r][1]:
+                r += 1
+            if r < len(ranges) and ranges[r][0] <= offset:
+                continue
+            yield offset, task
+
+    def record(self, start: int, end: int) -> None:
+        self.state["committed"] = _merge_ranges(self.state["committed"] + [[start, end]])
+        self._save()
+
+    def complete(self) -> None:
+        self.state["complete"] = True
+        self._save()
+
+    def _save(self) -> None:
+        self.state["updated_at"] = time.time()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,83 @@
+"""Process-pool stage for large merges: rewrite tasks and compute dedup keys.
+
+Tasks are cut into shards of SHARD_SIZE. Only the `data` dicts travel: each
+shard goes to a worker as one pickled list and comes back as one (keys,
+rewritten data) message, and the parent re-attaches annotations and the other
+task fields, which the rewrite never changes. IPC is per shard, not per task,
+and carries a fraction of each task. The RewritePlan and dedup field
+are sent once per worker through the pool initializer. Shards are consumed in
+submission order, so the merged order is the same as the single-process path.
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ls_dedup import data_key
+from ls_rewrite import RewritePlan
+
+# Below this many tasks process start-up and pickling cost more than they save
+PARALLEL_MIN_TASKS = 200_000
+SHARD_SIZE = 20_000
+
+_worker_plan: Optional[RewritePlan] = None
+_worker_dedup_field: Optional[str] = None
+
+
+def _init_worker(plan: RewritePlan, dedup_field: Optional[str]) -> None:
+    global _worker_plan, _worker_dedup_field
+    _worker_plan = plan
+    _worker_dedup_field = dedup_field
+
+
+def _rewrite_shard(datas: List[Dict[str, Any]]) -> Tuple[List[Union[str, bytes]], List[Dict[str, Any]]]:
+    rewritten = [_worker_plan.rewrite_data(d) for d in datas]
+    return [data_key(d, _worker_dedup_field) for d in rewritten], rewritten
+
+
+def iter_rewrite_keyed(
+    tasks: Iterable[Dict[str, Any]],
+    plan: RewritePlan,
+    dedup_field: Optional[str],
+    workers: Optional[int] = None,
+    shard_size: int = SHARD_SIZE,
+) -> Iterator[Tuple[Union[str, bytes], Dict[str, Any]]]:
+    """(dedup key, rewritten task) for every task, in input order.
+    At most two shards per worker are in flight, so a lazy `tasks` stream
+    is not read ahead by more than that.
+    """
+    workers = workers or os.cpu_count() or 1
+    it = iter(tasks)
+    shards = iter(lambda: list(itertools.islice(it, shard_size)), [])
+
+    def submit(shard: List[Dict[str, Any]]):
+        return shard, pool.submit(_rewrite_shard, [t.get("data", {}) for t in shard])
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(plan, dedup_field)) as pool:
+        inflight = [submit(s) for s in itertools.islice(shards, 2 * workers)]
+        while inflight:
+            shard, fut = inflight.pop(0)
+            keys, datas = fut.result()
+            for s in itertools.islice(shards, 1):
+                inflight.append(submit(s))
+            for k, t, d in zip(keys, shard, datas):
+                yield k, {**t, "data": d}
+
+
+def rewrite_keyed_lists(
+    lists: List[List[Dict[str, Any]]],
+    plan: RewritePlan,
+    dedup_field: Optional[str],
+    workers: Optional[int] = None,
+    shard_size: int = SHARD_SIZE,
+) -> Tuple[List[List[Dict[str, Any]]], List[List[Union[str, bytes]]]]:
+    """Rewrite per-project task lists in parallel; returns (rewritten lists, key lists)."""
+    sizes = [len(l) for l in lists]
+    keyed = iter_rewrite_keyed(itertools.chain.from_iterable(lists), plan, dedup_field, workers, shard_size)
+    out_lists: List[List[Dict[str, Any]]] = []
+    out_keys: List[List[Union[str, bytes]]] = []
+    for n in sizes:
+        pairs = list(itertools.islice(keyed, n))
+        out_keys.append([k for k, _ in pairs])
+        out_lists.append([t for _, t in pairs])
+    return out_lists, out_keys
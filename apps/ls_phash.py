@@ -0,0 +1,295 @@
+"""Near-duplicate image detection for merges (perceptual hashing).
+
+Each task's image URL is fetched and reduced to a 64-bit pHash (DCT of a
+32x32 grayscale thumbnail, low 8x8 frequencies thresholded at their median),
+so the same photo re-encoded or stored under another path hashes to within a
+few bits. Hashes are computed in a process pool and cached on disk by URL and
+validator (ETag / Last-Modified); unchanged images cost one 304 request.
+Seen hashes go into a BK-tree, so each lookup visits a small fraction of the
+index instead of every earlier image.
+
+Needs Pillow and numpy (`pip install Pillow numpy`).
+"""
+import io
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import numpy as np
+    from PIL import Image
+except Exception:
+    np = None
+    Image = None
+
+PHASH_CACHE = Path.home() / ".ls_project_tool" / "phash.sqlite"
+DEFAULT_DISTANCE = 6
+HASH_CHUNK = 1000
+FETCH_TIMEOUT = (10, 60)
+
+
+# ---- hashing ----
+
+_DCT_SIZE = 32
+_DCT = None
+
+
+def _dct_matrix(n: int):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+
+def phash(blob: bytes) -> int:
+    """64-bit perceptual hash of an encoded image."""
+    global _DCT
+    if _DCT is None:
+        _DCT = _dct_matrix(_DCT_SIZE)
+    img = Image.open(io.BytesIO(blob)).convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS)
+    pixels = np.asarray(img, dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:8, :8].flatten()
+    bits = low > np.median(low)
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+_SESSION: Optional[requests.Session] = None
+
+
+def _session() -> requests.Session:
+    """Keep-alive session of this worker process, reused for every image it fetches."""
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        _SESSION.mount("http://", adapter)
+        _SESSION.mount("https://", adapter)
+    return _SESSION
+
+
+def _get(url: str, headers: Dict[str, str], retry: Any) -> requests.Response:
+    """GET under `retry` (a RetryPolicy: attempts / statuses / delay()); None tries once."""
+    attempts = retry.attempts if retry is not None else 1
+    for attempt in range(1, attempts + 1):
+        try:
+            resp = _session().get(url, headers=headers, timeout=FETCH_TIMEOUT)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == attempts:
+                raise
+            time.sleep(retry.delay(attempt))
+            continue
+        if attempt < attempts and resp.status_code in retry.statuses:
+            delay = retry.delay(attempt, resp.headers.get("Retry-After"))
+            resp.close()
+            time.sleep(delay)
+            continue
+        return resp
+
+
+def _fetch_phash(job: Tuple[str, Optional[str], Dict[str, str], Any]) -> Tuple[Optional[str], Optional[int], bool]:
+    """Process-pool worker: (url, cached validator, headers, retry policy) -> (validator, hash, not_modified).
+    Unreachable or undecodable images return (None, None, False).
+    """
+    url, validator, headers, retry = job
+    headers = dict(headers)
+    if validator:
+        headers["If-None-Match" if not validator.startswith("lm:") else "If-Modified-Since"] = validator.removeprefix("lm:")
+    try:
+        resp = _get(url, headers, retry)
+        if resp.status_code == 304:
+            return validator, None, True
+        resp.raise_for_status()
+        etag = resp.headers.get("ETag")
+        modified = resp.headers.get("Last-Modified")
+        new_validator = etag or (f"lm:{modified}" if modified else None)
+        return new_validator, phash(resp.content), False
+    except Exception:
+        return None, None, False
+
+
+# ---- hash cache ----
+
+class PHashCache:
+    """url -> (validator, pHash) in a small SQLite file, shared across merges."""
+
+    def __init__(self, path: Path = PHASH_CACHE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS phash (url TEXT PRIMARY KEY, validator TEXT, hash TEXT)")
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Tuple[Optional[str], Optional[int]]:
+        with self._lock:
+            row = self._db.execute("SELECT validator, hash FROM phash WHERE url = ?", (url,)).fetchone()
+        return (row[0], int(row[1], 16)) if row else (None, None)
+
+    def put_many(self, rows: List[Tuple[str, Optional[str], int]]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO phash VALUES (?, ?, ?)",
+                ((url, validator, f"{h:016x}") for url, validator, h in rows),
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+# ---- index ----
+
+class BKTree:
+    """Metric tree over 64-bit hashes under Hamming distance."""
+
+    def __init__(self):
+        self._root: Optional[List[Any]] = None  # [hash, {distance: child}]
+        self.size = 0
+
+    def add(self, h: int) -> None:
+        if self._root is None:
+            self._root = [h, {}]
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = [h, {}]
+                self.size += 1
+                return
+            node = child
+
+    def contains_within(self, h: int, radius: int) -> bool:
+        """True if some indexed hash is within `radius` bits of `h`."""
+        if self._root is None:
+            return False
+        stack = [self._root]
+        while stack:
+            value, children = stack.pop()
+            d = hamming(h, value)
+            if d <= radius:
+                return True
+            for k, child in children.items():
+                if d - radius <= k <= d + radius:
+                    stack.append(child)
+        return False
+
+
+# ---- dedup stage ----
+
+def resolve_url(value: Any, base_url: str) -> Optional[str]:
+    """HTTP(S) URL for a data value; Label Studio-relative paths resolve against base_url."""
+    if not isinstance(value, str) or not value:
+        return None
+    if value.startswith(("http://", "https://")):
+        return value
+    if value.startswith("/"):
+        return f"{base_url.rstrip('/')}{value}"
+    return None  # s3://, gs://, inline data etc. cannot be fetched here
+
+
+def _hash_chunk(
+    pool: ProcessPoolExecutor,
+    cache: PHashCache,
+    urls: List[Optional[str]],
+    base_url: str,
+    auth_headers: Union[Dict[str, str], Callable[[], Dict[str, str]]],
+    retry: Any = None,
+    governor: Any = None,
+) -> Dict[str, Optional[int]]:
+    unique = sorted({u for u in urls if u})
+    cached = {u: cache.get(u) for u in unique}
+    # Only send credentials to the Label Studio server itself; fetched per chunk so expiring tokens are renewed
+    own = f"{base_url.rstrip('/')}/" if base_url else None
+    headers = (auth_headers() if callable(auth_headers) else auth_headers) if own else {}
+    futures = []
+    for u in unique:
+        same_server = bool(own) and u.startswith(own)
+        job = (u, cached[u][0] if cached[u][1] is not None else None, headers if same_server else {}, retry)
+        if same_server and governor is not None:
+            # Workers cannot see the parent's governor, so the slot is held here for the fetch
+            governor.acquire()
+            fut = pool.submit(_fetch_phash, job)
+            fut.add_done_callback(lambda f: governor.release())
+        else:
+            fut = pool.submit(_fetch_phash, job)
+        futures.append(fut)
+    hashes: Dict[str, Optional[int]] = {}
+    fresh = []
+    for u, (validator, h, not_modified) in zip(unique, (f.result() for f in futures)):
+        if not_modified:
+            hashes[u] = cached[u][1]
+        else:
+            hashes[u] = h
+            if h is not None:
+                fresh.append((u, validator, h))
+    if fresh:
+        cache.put_many(fresh)
+    return hashes
+
+
+def near_dedup_iter(
+    tasks: Iterable[Dict[str, Any]],
+    field: str,
+    base_url: str = "",
+    auth_headers: Union[None, Dict[str, str], Callable[[], Dict[str, str]]] = None,
+    distance: int = DEFAULT_DISTANCE,
+    workers: Optional[int] = None,
+    stats: Optional[Dict[str, int]] = None,
+    cache_path: Path = PHASH_CACHE,
+    chunk: int = HASH_CHUNK,
+    retry: Any = None,
+    governor: Any = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield tasks whose data[field] image is not within `distance` bits of an
+    earlier one. Order is preserved; tasks whose image cannot be fetched or
+    decoded are kept. `stats["near_dropped"]` / `stats["unhashed"]` count both.
+    `auth_headers` may be a callable, called once per chunk. Fetches are retried
+    per `retry` (a RetryPolicy), and fetches from base_url hold a `governor`
+    slot (acquire / release) so they count against the server's limits.
+    """
+    if np is None or Image is None:
+        raise RuntimeError("Pillow and numpy not found. Please `pip install Pillow numpy` for near-duplicate detection.")
+    if stats is None:
+        stats = {}
+    stats.setdefault("near_dropped", 0)
+    stats.setdefault("unhashed", 0)
+    auth_headers = auth_headers or {}
+    tree = BKTree()
+    cache = PHashCache(cache_path)
+    it = iter(tasks)
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            while True:
+                batch = list(itertools.islice(it, chunk))
+                if not batch:
+                    return
+                urls = [resolve_url((t.get("data") or {}).get(field), base_url) for t in batch]
+                hashes = _hash_chunk(pool, cache, urls, base_url, auth_headers, retry, governor)
+                for t, u in zip(batch, urls):
+                    h = hashes.get(u) if u else None
+                    if h is None:
+                        stats["unhashed"] += 1
+                        yield t
+                    elif tree.contains_within(h, distance):
+                        stats["near_dropped"] += 1
+                    else:
+                        tree.add(h)
+                        yield t
+    finally:
+        cache.close()
@@ -0,0 +1,212 @@
+"""Field Rewriter: task `data` rewrites applied before merge/import.
+
+RewritePlan compiles an ordered rule list (renames, URL prefixes, regex
+replacements; nested keys and conditions allowed) once, so applying it is a
+short loop of prebuilt steps per task. It is a plain picklable object, so it
+can also be shipped to worker processes.
+"""
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple, Union
+
+
+def apply_key_renames(d: Dict[str, Any], renames: Dict[str, str]) -> Dict[str, Any]:
+    out = dict(d)
+    for old, new in renames.items():
+        if old in out:
+            if new == "":
+                # delete field
+                out.pop(old, None)
+            elif new != old:
+                out[new] = out.pop(old)
+    return out
+
+
+def apply_prefix_url(value: Any, base: str, strip_dirs: bool) -> Any:
+    if not isinstance(value, str):
+        return value
+    v = value
+    if strip_dirs:
+        v = Path(v).name
+    if base.endswith("/"):
+        return base + v
+    else:
+        return base + "/" + v
+
+
+def apply_regex(value: Any, pattern: Union[str, Pattern], repl: str) -> Any:
+    if not isinstance(value, str):
+        return value
+    try:
+        return re.sub(pattern, repl, value)
+    except re.error:
+        return value
+
+
+# ---- rule engine ----
+
+RULE_OPS = ("rename", "prefix", "regex")
+_MISSING = object()
+
+
+def _split_path(field: str) -> Tuple[str, ...]:
+    """'meta.image' -> ('meta', 'image'): dots address nested `data` keys."""
+    return tuple(p for p in field.strip().split(".") if p)
+
+
+def _get_path(data: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    node: Any = data
+    for key in path:
+        if not isinstance(node, dict) or key not in node:
+            return _MISSING
+        node = node[key]
+    return node
+
+
+def _set_path(data: Dict[str, Any], path: Tuple[str, ...], value: Any) -> None:
+    """Set (or delete, for _MISSING) a nested key, copying the dicts along the path."""
+    node = data
+    for key in path[:-1]:
+        child = node.get(key)
+        if not isinstance(child, dict):
+            if value is _MISSING:
+                return
+            child = {}
+        node[key] = child = dict(child)
+        node = child
+    if value is _MISSING:
+        node.pop(path[-1], None)
+    else:
+        node[path[-1]] = value
+
+
+def _basename(value: str) -> str:
+    """Path(value).name for file paths and URLs, without building a Path."""
+    return value.rstrip("/").rpartition("/")[2]
+
+
+def _compile(pattern: str, where: str) -> Pattern:
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise RuntimeError(f"Invalid regex pattern {pattern!r} in {where}: {e}")
+
+
+class RewritePlan:
+    """An ordered list of rewrite rules over task `data`, compiled once into
+    (op, key path, args, condition) steps.
+
+    Rules are dicts with an "op" and a "field" (dots reach nested keys):
+      {"op": "rename", "field": "file_upload", "to": "image"}   ("to": "" deletes)
+      {"op": "prefix", "field": "image", "base": "https://host/bucket", "strip_dirs": True}
+      {"op": "regex",  "field": "meta.path", "pattern": "^/old/", "repl": "/new/"}
+    Any rule may add "when_field" / "when_pattern" to apply only to tasks
+    whose when_field is a string matching when_pattern (re.search).
+    Prefix and regex rules only touch string values. Invalid patterns raise
+    RuntimeError here, once, instead of being skipped per task.
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None):
+        self.rules: List[Dict[str, Any]] = [dict(r) for r in (rules or [])]
+        self._steps = [self._compile_rule(i, r) for i, r in enumerate(self.rules, 1)]
+
+    @classmethod
+    def from_settings(
+        cls,
+        renames: Optional[Dict[str, str]] = None,
+        prefix_field: Optional[str] = None,
+        base_url: Optional[str] = None,
+        strip_dirs: bool = True,
+        regex_field: Optional[str] = None,
+        regex_pattern: Optional[str] = None,
+        regex_repl: Optional[str] = None,
+        extra_rules: Optional[List[Dict[str, Any]]] = None,
+    ) -> "RewritePlan":
+        """Rules equivalent to the single-field Field Rewriter settings, then `extra_rules`."""
+        rules: List[Dict[str, Any]] = [
+            {"op": "rename", "field": old, "to": new} for old, new in (renames or {}).items()
+        ]
+        if prefix_field and base_url:
+            rules.append({"op": "prefix", "field": prefix_field, "base": base_url, "strip_dirs": strip_dirs})
+        if regex_field and regex_pattern is not None and regex_repl is not None:
+            rules.append({"op": "regex", "field": regex_field, "pattern": regex_pattern, "repl": regex_repl})
+        return cls(rules + list(extra_rules or []))
+
+    @staticmethod
+    def _compile_rule(i: int, rule: Dict[str, Any]) -> Tuple[Any, ...]:
+        op = rule.get("op")
+        where = f"rule {i} ({op})"
+        if op not in RULE_OPS:
+            raise RuntimeError(f"Unknown rewrite op {op!r} in rule {i}; expected one of {', '.join(RULE_OPS)}")
+        path = _split_path(rule.get("field") or "")
+        if not path:
+            raise RuntimeError(f"Missing field in {where}")
+        when = None
+        if rule.get("when_field"):
+            when = (_split_path(rule["when_field"]), _compile(rule.get("when_pattern") or "", where))
+        if op == "rename":
+            to = rule.get("to") or ""
+            return (op, path, _split_path(to) if to else None, when)
+        if op == "prefix":
+            base = rule.get("base") or ""
+            if not base:
+                raise RuntimeError(f"Missing base URL in {where}")
+            return (op, path, (base if base.endswith("/") else base + "/", bool(rule.get("strip_dirs", True))), when)
+        regex, repl = _compile(rule.get("pattern") or "", where), rule.get("repl") or ""
+        try:
+            regex.sub(repl, "")  # parses the replacement template (group references)
+        except re.error as e:
+            raise RuntimeError(f"Invalid replacement {repl!r} in {where}: {e}")
+        return (op, path, (regex, repl), when)
+
+    def rewrite_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Rewritten copy of one task's `data`; nested dicts are copied only where written."""
+        out = dict(data)
+        for op, path, arg, when in self._steps:
+            if when is not None:
+                c = _get_path(out, when[0])
+                if not isinstance(c, str) or when[1].search(c) is None:
+                    continue
+            v = _get_path(out, path)
+            if op == "rename":
+                if v is _MISSING or arg == path:
+                    continue
+                if arg is not None:
+                    _set_path(out, arg, v)
+                _set_path(out, path, _MISSING)
+            elif isinstance(v, str):
+                if op == "prefix":
+                    base, strip_dirs = arg
+                    _set_path(out, path, base + (_basename(v) if strip_dirs else v))
+                else:
+                    _set_path(out, path, arg[0].sub(arg[1], v))
+        return out
+
+    def apply_many(self, tasks: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rewritten copies of `tasks`, in order; the inputs are not modified."""
+        apply = self.apply
+        return [apply(t) for t in tasks]
+
+    def apply(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        new_task = dict(task)
+        new_task["data"] = self.rewrite_data(task.get("data", {}))
+        return new_task
+
+
+def rewrite_task_data(
+    task: Dict[str, Any],
+    renames: Dict[str, str],
+    prefix_field: Optional[str],
+    base_url: Optional[str],
+    strip_dirs: bool,
+    regex_field: Optional[str],
+    regex_pattern: Optional[str],
+    regex_repl: Optional[str],
+) -> Dict[str, Any]:
+    """One-off rewrite; build a RewritePlan once to rewrite many tasks."""
+    try:
+        plan = RewritePlan.from_settings(renames, prefix_field, base_url, strip_dirs, regex_field, regex_pattern, regex_repl)
+    except RuntimeError:
+        # Historical behaviour: an invalid pattern leaves the value unchanged
+        plan = RewritePlan.from_settings(renames, prefix_field, base_url, strip_dirs)
+    return plan.apply(task)
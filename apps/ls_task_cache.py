@@ -0,0 +1,114 @@
+"""Local task cache for incremental (delta) stream exports.
+
+Reduced tasks (data + annotation/prediction results) are stored per server,
+project and task id in a SQLite file together with the task's `updated_at`.
+After one full export, re-exporting a project asks the server only for tasks
+updated since the newest `updated_at` already cached (the sync watermark),
+upserts them and reads the project back from disk.
+
+Label Studio bumps a task's updated_at when its annotations change, so edits
+are picked up too. Deletions are not visible through that filter; the caller
+compares the cached count with the project's task count and falls back to a
+full export when they disagree.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+TASK_CACHE = Path.home() / ".ls_project_tool" / "tasks.sqlite"
+READ_CHUNK = 1000
+
+
+class TaskCache:
+    """(server, project, task id) -> (updated_at, reduced task JSON), plus one sync row per project."""
+
+    def __init__(self, path: Path = TASK_CACHE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "server TEXT, project_id INTEGER, task_id INTEGER, updated_at TEXT, item TEXT, "
+            "PRIMARY KEY (server, project_id, task_id)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS syncs ("
+            "server TEXT, project_id INTEGER, watermark TEXT, annotations INTEGER, predictions INTEGER, synced_at REAL, "
+            "PRIMARY KEY (server, project_id))"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def sync_state(self, server: str, project_id: int) -> Optional[Dict[str, Any]]:
+        """Watermark and cached parts of the last completed sync, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT watermark, annotations, predictions FROM syncs WHERE server = ? AND project_id = ?",
+                (server, project_id),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"watermark": row[0], "annotations": bool(row[1]), "predictions": bool(row[2])}
+
+    def begin_full(self, server: str, project_id: int) -> None:
+        """Drop a project's tasks and sync row before a full re-export."""
+        with self._lock:
+            self._db.execute("DELETE FROM syncs WHERE server = ? AND project_id = ?", (server, project_id))
+            self._db.execute("DELETE FROM tasks WHERE server = ? AND project_id = ?", (server, project_id))
+            self._db.commit()
+
+    def upsert(self, server: str, project_id: int, rows: List[Tuple[int, Optional[str], Dict[str, Any]]]) -> None:
+        """Insert or replace (task_id, updated_at, item) rows."""
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?)",
+                ((server, project_id, tid, updated, json.dumps(item, ensure_ascii=False)) for tid, updated, item in rows),
+            )
+            self._db.commit()
+
+    def finish(self, server: str, project_id: int, watermark: str, annotations: bool, predictions: bool) -> None:
+        """Record a completed sync; later exports fetch only tasks updated since `watermark`."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO syncs VALUES (?, ?, ?, ?, ?, ?)",
+                (server, project_id, watermark, int(annotations), int(predictions), time.time()),
+            )
+            self._db.commit()
+
+    def count(self, server: str, project_id: int) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM tasks WHERE server = ? AND project_id = ?", (server, project_id)
+            ).fetchone()[0]
+
+    def iter_items(
+        self, server: str, project_id: int, include_annotations: bool = True, include_predictions: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """Cached tasks in task id order, without the parts not asked for."""
+        last = -1
+        while True:
+            # Keyset pages, so the shared connection is never held between yields
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT task_id, item FROM tasks WHERE server = ? AND project_id = ? AND task_id > ? "
+                    "ORDER BY task_id LIMIT ?",
+                    (server, project_id, last, READ_CHUNK),
+                ).fetchall()
+            if not rows:
+                return
+            for tid, blob in rows:
+                item = json.loads(blob)
+                if not include_annotations:
+                    item.pop("annotations", None)
+                if not include_predictions:
+                    item.pop("predictions", None)
+                yield item
+            last = rows[-1][0]
+
+    def close(self) -> None:
+        self._db.close()